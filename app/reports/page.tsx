@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
-import type { Report } from '@/lib/types'
+import type { ReportSummary } from '@/lib/types'
 
 const TYPE_CONFIG = {
   bug: { label: 'Bug', color: 'var(--color-bug)', bg: 'var(--color-bug-bg)' },
@@ -29,7 +29,7 @@ function formatTime(iso: string) {
 }
 
 export default function ReportsPage() {
-  const [reports, setReports] = useState<Report[]>([])
+  const [reports, setReports] = useState<ReportSummary[]>([])
   const [expandedId, setExpandedId] = useState<string | null>(null)
 
   useEffect(() => {
@@ -39,7 +39,8 @@ export default function ReportsPage() {
       try {
         const res = await fetch(`${process.env.NEXT_PUBLIC_FDE_URL || 'http://localhost:8000'}/api/fde/reports`)
         if (res.ok && active) {
-          setReports(await res.json())
+          const { reports } = await res.json()
+          setReports(reports)
         }
       } catch {
         // ignore fetch errors
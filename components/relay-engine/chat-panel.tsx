@@ -30,6 +30,40 @@ const PANEL_WIDTH = 380
 const PANEL_HEIGHT = 520
 const PANEL_GAP = 12
 
+// Large bodies (page snapshot, logs, events) are gzipped; the server inflates them (server/compression.py)
+async function gzipRequest(init: RequestInit | undefined): Promise<RequestInit | undefined> {
+  const body = init?.body
+  if (typeof body !== 'string' || body.length < 8192 || typeof CompressionStream === 'undefined') return init
+  const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'))
+  const headers = new Headers(init?.headers)
+  headers.set('Content-Encoding', 'gzip')
+  return { ...init, headers, body: await new Response(stream).arrayBuffer() }
+}
+
+// The server keeps each conversation's transcript (server/agent/transcripts.py), so after the first
+// turn only the new message is sent. A 409 means the server lost track (e.g. it restarted): resend
+// the full history once.
+function transcriptTransport(api: string, body: Record<string, unknown>) {
+  let fullBody = ''
+  return new DefaultChatTransport({
+    api,
+    body,
+    prepareSendMessagesRequest: ({ id, messages, body: merged }) => {
+      const full = { ...merged, conversationId: id, baseMessageCount: 0, messages }
+      fullBody = JSON.stringify(full)
+      if (messages.length <= 1) return { body: full }
+      return {
+        body: { conversationId: id, baseMessageCount: messages.length - 1, messages: messages.slice(-1) },
+      }
+    },
+    fetch: async (input, init) => {
+      const res = await fetch(input, await gzipRequest(init))
+      if (res.status !== 409 || init?.body === fullBody) return res
+      return fetch(input, await gzipRequest({ ...init, body: fullBody }))
+    },
+  })
+}
+
 const easeCurve: [number, number, number, number] = [0.22, 1, 0.36, 1]
 
 const panelVariants = {
@@ -251,19 +285,24 @@ export default function ChatPanel({
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const [posStyle, setPosStyle] = useState<React.CSSProperties>({})
   const [pendingActions, setPendingActions] = useState<PendingAction[]>([])
+  const [queuePosition, setQueuePosition] = useState<number | null>(null)
 
   const { messages, sendMessage, status } = useChat({
-    transport: new DefaultChatTransport({
-      api: `${process.env.NEXT_PUBLIC_FDE_URL || 'http://localhost:8000'}/api/fde/stream`,
-      body: {
-        elementContext,
-        autoTriggered,
-        errorMessage,
-        sessionId: posthog.__loaded ? posthog.get_session_id?.() : undefined,
-        recentEvents: getBufferedEvents(),
-        pageSnapshot: capturePageSnapshot(),
-      },
+    transport: transcriptTransport(`${process.env.NEXT_PUBLIC_FDE_URL || 'http://localhost:8000'}/api/fde/stream`, {
+      elementContext,
+      autoTriggered,
+      errorMessage,
+      sessionId: posthog.__loaded ? posthog.get_session_id?.() : undefined,
+      recentEvents: getBufferedEvents(),
+      pageSnapshot: capturePageSnapshot(),
     }),
+    onData: (part) => {
+      // Server-side admission queue: { status: 'queued', position } until a slot frees up
+      if (part.type === 'data-queue') {
+        const data = part.data as { status: string; position?: number }
+        setQueuePosition(data.status === 'queued' ? data.position ?? null : null)
+      }
+    },
     onError: (error) => {
       console.error('[relay] Chat error:', error)
     },
@@ -271,6 +310,10 @@ export default function ChatPanel({
 
   const isLoading = status === 'submitted' || status === 'streaming'
 
+  useEffect(() => {
+    if (!isLoading) setQueuePosition(null)
+  }, [isLoading])
+
   // Log status changes
   useEffect(() => {
     console.log('[relay] Chat status:', status, '| messages:', messages.length)
@@ -636,6 +679,11 @@ export default function ChatPanel({
                       padding: '6px 14px',
                     }}
                   >
+                    {queuePosition !== null && (
+                      <div style={{ fontSize: 12, color: 'var(--color-text-tertiary)' }}>
+                        Lots of people need help right now — you&apos;re #{queuePosition} in line
+                      </div>
+                    )}
                     <BouncingDots />
                   </div>
                 </div>
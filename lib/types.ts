@@ -39,6 +39,9 @@ export interface Report {
   createdAt: string
 }
 
+/** Report as listed by GET /api/fde/reports — detail fields come from /api/fde/reports/:id */
+export type ReportSummary = Omit<Report, 'conversationLog' | 'eventTimeline'>
+
 export interface TimelineEvent {
   id: string
   event: string
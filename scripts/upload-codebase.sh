@@ -3,64 +3,96 @@ set -euo pipefail
 
 # Upload source files to the relay-engine server so the agent's
 # readSourceFile tool can access them on Railway.
+#
+# Only files whose sha256 differs from the server's manifest are sent,
+# along with the paths that no longer exist locally. Set FULL_UPLOAD=1
+# to ignore the manifest and re-send everything.
 
 SERVER="${FDE_URL:-https://ai-fde-production.up.railway.app}"
 ENDPOINT="${SERVER}/api/codebase/upload"
+MANIFEST_URL="${SERVER}/api/codebase/manifest?project=relay-engine&frontend_dir=frontend&backend_dir=backend&backend_prefix=server/"
 ROOT="$(cd "$(dirname "$0")/.." && pwd)"
 
 DIRS=(app components lib docs server)
 
+WORK="$(mktemp -d)"
+trap 'rm -rf "$WORK"' EXIT
+
 echo "Collecting files from: ${DIRS[*]}"
 echo "Uploading to: ${ENDPOINT}"
 
-# Build the JSON files array using jq
-FILES_JSON="[]"
-count=0
-
+# Local manifest: "<sha256>  <relative path>" per line
+: > "$WORK/local"
 for dir in "${DIRS[@]}"; do
   dir_path="${ROOT}/${dir}"
   [ -d "$dir_path" ] || continue
 
-  while IFS= read -r -d '' file; do
-    rel_path="${file#"${ROOT}/"}"
-    content=$(<"$file")
-    FILES_JSON=$(jq --arg path "$rel_path" --arg content "$content" \
-      '. + [{"path": $path, "content": $content}]' <<< "$FILES_JSON")
-    count=$((count + 1))
-  done < <(find "$dir_path" -type f \
+  (cd "$ROOT" && find "$dir" -type f \
     \( -name '*.ts' -o -name '*.tsx' -o -name '*.js' -o -name '*.jsx' \
        -o -name '*.css' -o -name '*.json' -o -name '*.md' -o -name '*.mdx' \
        -o -name '*.py' -o -name '*.toml' -o -name '*.yaml' -o -name '*.yml' \) \
-    -print0)
+    -print0 | xargs -0 -r sha256sum) >> "$WORK/local"
 done
 
-if [ "$count" -eq 0 ]; then
-  echo "No files found — nothing to upload."
+# Remote manifest in the same format; empty when forced or unavailable
+: > "$WORK/remote"
+if [ "${FULL_UPLOAD:-0}" != "1" ]; then
+  if curl -sf "$MANIFEST_URL" -o "$WORK/manifest.json"; then
+    jq -r '.files | to_entries[] | "\(.value)  \(.key)"' "$WORK/manifest.json" > "$WORK/remote"
+  else
+    echo "Manifest unavailable — falling back to a full upload."
+  fi
+fi
+
+# sha256sum lines are 64 hex chars, two spaces, then the path
+awk 'FILENAME == ARGV[1] { remote[substr($0, 67)] = substr($0, 1, 64); next }
+     remote[substr($0, 67)] != substr($0, 1, 64) { print substr($0, 67) }' \
+  "$WORK/remote" "$WORK/local" > "$WORK/changed"
+awk 'FILENAME == ARGV[1] { local[substr($0, 67)] = 1; next }
+     !(substr($0, 67) in local) { print substr($0, 67) }' \
+  "$WORK/local" "$WORK/remote" > "$WORK/deleted"
+
+changed=$(wc -l < "$WORK/changed" | tr -d ' ')
+deleted=$(wc -l < "$WORK/deleted" | tr -d ' ')
+
+if [ "$changed" -eq 0 ] && [ "$deleted" -eq 0 ]; then
+  echo "Server is up to date — nothing to upload."
   exit 0
 fi
 
-PAYLOAD=$(jq -n --argjson files "$FILES_JSON" '{
+# One small JSON object per changed file, slurped once at the end
+: > "$WORK/files.ndjson"
+while IFS= read -r rel_path; do
+  jq -n --arg path "$rel_path" --rawfile content "${ROOT}/${rel_path}" \
+    '{path: $path, content: $content}' >> "$WORK/files.ndjson"
+done < "$WORK/changed"
+
+jq -s --rawfile deleted "$WORK/deleted" '{
   project: "relay-engine",
   frontend_dir: "frontend",
   backend_dir: "backend",
   backend_prefix: "server/",
-  files: $files
-}')
+  files: .,
+  deleted: ($deleted | split("\n") | map(select(length > 0)))
+}' "$WORK/files.ndjson" > "$WORK/payload.json"
+
+echo "Uploading ${changed} changed file(s), deleting ${deleted}..."
 
-echo "Uploading ${count} files..."
+gzip -c "$WORK/payload.json" > "$WORK/payload.json.gz"
 
-HTTP_CODE=$(curl -s -o /tmp/upload-response.json -w '%{http_code}' \
+HTTP_CODE=$(curl -s -o "$WORK/response.json" -w '%{http_code}' \
   -X POST "$ENDPOINT" \
   -H 'Content-Type: application/json' \
-  -d "$PAYLOAD")
+  -H 'Content-Encoding: gzip' \
+  --data-binary "@$WORK/payload.json.gz")
 
 if [ "$HTTP_CODE" -ge 200 ] && [ "$HTTP_CODE" -lt 300 ]; then
   echo "Success (HTTP ${HTTP_CODE})"
-  cat /tmp/upload-response.json
+  cat "$WORK/response.json"
   echo
 else
   echo "Failed (HTTP ${HTTP_CODE})"
-  cat /tmp/upload-response.json
+  cat "$WORK/response.json"
   echo
   exit 1
 fi
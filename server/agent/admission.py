@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Callable
+
+from agent import metrics
+from agent.config import (
+    AGENT_MAX_ACTIVE_SESSIONS,
+    AGENT_MAX_QUEUED_SESSIONS,
+    AGENT_MAX_SESSIONS_PER_ID,
+    AGENT_QUEUE_TIMEOUT_SECONDS,
+)
+from agent.models import FDERequest
+
+logger = logging.getLogger("relay")
+
+# How often a queued session is told its (possibly changed) position
+QUEUE_STATUS_INTERVAL_SECONDS = 2.0
+
+_BUSY_MESSAGE = "The assistant is busy right now — please try again in a moment."
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(req: FDERequest) -> str | None:
+    """Who the per-client session cap counts against, or None if the request can't be told apart.
+
+    The PostHog sessionId when the client sent one, otherwise the chat's
+    conversationId. The "current" default is shared by every client without
+    PostHog, so it is never used as a key.
+    """
+    if req.sessionId and req.sessionId != FDERequest.model_fields["sessionId"].default:
+        return f"session:{req.sessionId}"
+    if req.conversationId:
+        return f"conversation:{req.conversationId}"
+    return None
+
+
+class _Ticket:
+    def __init__(self, client: str | None, admitted: bool) -> None:
+        self.client = client
+        self.admitted = admitted
+        self.released = False
+        self.queued_at = time.monotonic()
+        self.ready: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        if admitted:
+            self.ready.set_result(None)
+
+
+def _status(payload: dict) -> str:
+    # Transient data part: shown while streaming, not kept in the message history
+    return f"data: {json.dumps({'type': 'data-queue', 'data': payload, 'transient': True})}\n\n"
+
+
+class AdmissionController:
+    """Caps concurrent agent loops, with a bounded FIFO wait queue.
+
+    ``reserve`` decides synchronously — before any response bytes are sent —
+    whether a request runs now, waits, or is rejected (queue full, or too many
+    sessions for one client, see client_key), so rejections can be a plain 429.
+    A reserved ticket is released exactly once: by ``run`` when it finishes,
+    or by the caller if ``run`` never gets going.
+    """
+
+    def __init__(self, max_active: int, max_queued: int, max_per_session: int, queue_timeout: float) -> None:
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_per_session = max_per_session
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.rejected = 0
+        self._waiting: deque[_Ticket] = deque()
+        self._per_session: Counter[str] = Counter()
+        self._avg_session_seconds = 10.0  # seed for Retry-After until sessions finish
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.admission_active.set(self.active)
+        metrics.admission_queued.set(len(self._waiting))
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a newly queued request."""
+        rounds = (len(self._waiting) + 1) / max(self.max_active, 1)
+        return max(1, math.ceil(self._avg_session_seconds * rounds))
+
+    def _reject(self, reason: str, client: str | None) -> AdmissionRejected:
+        self.rejected += 1
+        metrics.admission_rejected_total.inc(reason=reason)
+        logger.warning("[admission] Rejected %s — %s (%d active, %d queued)",
+                       client or "anonymous client", reason, self.active, len(self._waiting))
+        return AdmissionRejected(reason, self.retry_after())
+
+    def reserve(self, client: str | None) -> _Ticket:
+        """A running or queued ticket, or AdmissionRejected. ``client`` None skips the per-client cap."""
+        if client is not None and self._per_session[client] >= self.max_per_session:
+            raise self._reject("session_limit", client)
+        if self.active < self.max_active and not self._waiting:
+            ticket = _Ticket(client, admitted=True)
+            self.active += 1
+        elif len(self._waiting) < self.max_queued:
+            ticket = _Ticket(client, admitted=False)
+            self._waiting.append(ticket)
+        else:
+            raise self._reject("queue_full", client)
+        if client is not None:
+            self._per_session[client] += 1
+        self._publish()
+        return ticket
+
+    def position(self, ticket: _Ticket) -> int:
+        try:
+            return self._waiting.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def release(self, ticket: _Ticket, elapsed: float | None = None) -> None:
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted:
+            self.active -= 1
+            if elapsed is not None:
+                self._avg_session_seconds = 0.8 * self._avg_session_seconds + 0.2 * elapsed
+        else:
+            self._waiting.remove(ticket)
+        if ticket.client is not None:
+            self._per_session[ticket.client] -= 1
+            if not self._per_session[ticket.client]:
+                del self._per_session[ticket.client]
+        # Hand freed slots to the queue in arrival order
+        while self._waiting and self.active < self.max_active:
+            waiter = self._waiting.popleft()
+            waiter.admitted = True
+            self.active += 1
+            metrics.admission_wait_seconds.observe(time.monotonic() - waiter.queued_at)
+            waiter.ready.set_result(None)
+        self._publish()
+
+    async def run(
+        self,
+        ticket: _Ticket,
+        start: Callable[[FDERequest], AsyncIterator[str]],
+        req: FDERequest,
+    ) -> AsyncIterator[str]:
+        """``start(req)``'s frames once the ticket is admitted, with queue status frames while waiting."""
+        started = None
+        try:
+            if not ticket.admitted:
+                deadline = ticket.queued_at + self.queue_timeout
+                while not ticket.admitted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.admission_rejected_total.inc(reason="timeout")
+                        yield f"data: {json.dumps({'type': 'error', 'error': _BUSY_MESSAGE})}\n\n"
+                        yield "data: [DONE]\n\n"
+                        return
+                    yield _status({"status": "queued", "position": self.position(ticket), "retryAfter": self.retry_after()})
+                    await asyncio.wait({ticket.ready}, timeout=min(QUEUE_STATUS_INTERVAL_SECONDS, remaining))
+                yield _status({"status": "admitted"})
+            started = time.monotonic()
+            frames = start(req)
+            try:
+                async for frame in frames:
+                    yield frame
+            finally:
+                await frames.aclose()
+        finally:
+            self.release(ticket, None if started is None else time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self._waiting),
+            "maxActive": self.max_active,
+            "maxQueued": self.max_queued,
+            "rejected": self.rejected,
+        }
+
+
+admission = AdmissionController(
+    AGENT_MAX_ACTIVE_SESSIONS,
+    AGENT_MAX_QUEUED_SESSIONS,
+    AGENT_MAX_SESSIONS_PER_ID,
+    AGENT_QUEUE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from agent.outline import Symbol, outline
+
+# Only text sources are indexed; lockfiles, bundles and assets are skipped
+INDEXED_SUFFIXES = frozenset({
+    ".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".py", ".md", ".json", ".css",
+    ".sql", ".toml", ".yaml", ".yml", ".html", ".sh", ".txt",
+})
+SKIPPED_DIRS = frozenset({"node_modules", ".next", ".git", "__pycache__", ".venv", "venv", "data"})
+MAX_INDEXED_FILE_BYTES = 256 * 1024
+
+# Matching lines shown per file, so one noisy file can't crowd out the rest
+HITS_PER_FILE = 5
+MAX_SNIPPET_LINE_CHARS = 200
+# Lines one search may run the matcher over; a query too vague to narrow stops there
+MAX_SCANNED_LINES = 200_000
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _literal_runs(pattern: str) -> list[str] | None:
+    """Literal strings every match of ``pattern`` must contain, or None if it has a top-level ``|``.
+
+    Deliberately conservative: only text outside groups and character classes
+    counts, and a character followed by ``?``, ``*`` or ``{`` is dropped.
+    """
+    runs: list[str] = []
+    run = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            runs.append(run)
+            run = ""
+            i += 2
+            continue
+        if c == "[":
+            runs.append(run)
+            run = ""
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":
+                i += 1  # a leading "]" is literal
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+        elif c in "*?{":
+            runs.append(run[:-1])
+            run = ""
+            if c == "{":
+                i = pattern.find("}", i)
+                if i < 0:
+                    break
+        elif c == "|" and depth == 0:
+            return None
+        elif c in "().^$+|":
+            runs.append(run)
+            run = ""
+            depth += {"(": 1, ")": -1}.get(c, 0)
+        elif depth == 0:
+            run += c
+        i += 1
+    runs.append(run)
+    return [r for r in runs if r]
+
+
+@dataclass
+class _Base:
+    prefix: str  # prepended to paths under this directory, e.g. "server/"
+    texts: dict[str, str] = field(default_factory=dict)  # path -> content
+    outlines: dict[str, list[Symbol]] = field(default_factory=dict)  # path -> its symbols
+    postings: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))  # trigram -> paths
+
+
+def _read(path: Path) -> str | None:
+    if path.suffix not in INDEXED_SUFFIXES:
+        return None
+    try:
+        if path.stat().st_size > MAX_INDEXED_FILE_BYTES:
+            return None
+        return path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+class CodeIndex:
+    """Trigram index and symbol outlines over source files, for searchCode and readSourceFile.
+
+    Each indexed directory (e.g. data/{project}/frontend) maps every trigram of
+    its lowercased files to the paths containing it. A query's literal text —
+    the whole query, or the fragments a regex can't match without — narrows
+    the search to files holding all of its trigrams, and only those are
+    scanned line by line, for at most MAX_SCANNED_LINES. Directories are
+    walked once, on first search or after an upload; from then on the upload
+    endpoints keep them current through add() / remove(), like the tree
+    index. Each file's outline is computed when it is indexed, so symbol
+    reads never parse on demand.
+
+    The lock only guards swapping entries in and out: walking, reading,
+    outlining and matching all happen outside it, so pool workers never
+    queue behind one another's index work.
+    """
+
+    def __init__(self) -> None:
+        self._bases: dict[Path, _Base] = {}
+        # Directories being walked, with the files add()/remove() touched meanwhile
+        self._building: dict[Path, set[Path]] = {}
+        self._build_locks: dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prepare(path: str, text: str) -> tuple[str, list[Symbol], set[str]]:
+        return text, outline(path, text), _trigrams(text.lower())
+
+    def _install(self, base: _Base, path: str, prepared: tuple[str, list[Symbol], set[str]]) -> None:
+        """Swap in a file prepared by _prepare. Call with the lock held (or on a base nobody else sees)."""
+        text, symbols, grams = prepared
+        self._unindex(base, path)
+        base.texts[path] = text
+        base.outlines[path] = symbols
+        for gram in grams:
+            base.postings[gram].add(path)
+
+    def _unindex(self, base: _Base, path: str) -> None:
+        text = base.texts.pop(path, None)
+        base.outlines.pop(path, None)
+        if text is None:
+            return
+        for gram in _trigrams(text.lower()):
+            paths = base.postings[gram]
+            paths.discard(path)
+            if not paths:
+                del base.postings[gram]
+
+    def _base(self, directory: Path, prefix: str) -> _Base:
+        """Indexed base for directory, walking it on first use. Blocking; call without the lock."""
+        with self._lock:
+            base = self._bases.get(directory)
+            if base is not None:
+                return base
+            build_lock = self._build_locks.setdefault(directory, threading.Lock())
+        with build_lock:  # one walk per directory, however many searches ask for it
+            with self._lock:
+                base = self._bases.get(directory)
+                if base is not None:
+                    return base
+                self._building[directory] = set()
+            base = _Base(prefix)
+            try:
+                for root, dirs, files in os.walk(directory):
+                    dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+                    rel_root = Path(root).relative_to(directory)
+                    for name in files:
+                        text = _read(Path(root) / name)
+                        if text is not None:
+                            path = prefix + (rel_root / name).as_posix()
+                            self._install(base, path, self._prepare(path, text))
+            except BaseException:
+                with self._lock:
+                    del self._building[directory]
+                raise
+            with self._lock:
+                touched = self._building.pop(directory)
+                self._bases[directory] = base
+        # Files written during the walk may have been read before the write
+        for dest in touched:
+            self.add(dest)
+        return base
+
+    def warm(self, roots: list[tuple[Path, str]]) -> None:
+        """Build the index for each (directory, path prefix) that hasn't been walked yet."""
+        for directory, prefix in roots:
+            if directory.exists():
+                self._base(directory, prefix)
+
+    def _locate(self, dest: Path) -> tuple[_Base, str] | None:
+        """Base and indexed path for dest. Call with the lock held; records dest if its directory is being walked."""
+        for directory, base in self._bases.items():
+            if dest.is_relative_to(directory):
+                return base, base.prefix + dest.relative_to(directory).as_posix()
+        for directory, touched in self._building.items():
+            if dest.is_relative_to(directory):
+                touched.add(dest)
+        return None
+
+    def add(self, dest: Path, content: str | None = None) -> None:
+        """(Re)index a written file; ``content`` saves reading it back from disk."""
+        with self._lock:
+            found = self._locate(dest)
+        if found is None:
+            return  # directory not indexed yet — the first search will walk it
+        base, path = found
+        if content is None or dest.suffix not in INDEXED_SUFFIXES or len(content) > MAX_INDEXED_FILE_BYTES:
+            content = _read(dest)
+        prepared = self._prepare(path, content) if content is not None else None
+        with self._lock:
+            if prepared is None:
+                self._unindex(base, path)
+            else:
+                self._install(base, path, prepared)
+
+    def remove(self, dest: Path) -> None:
+        with self._lock:
+            found = self._locate(dest)
+            if found is not None:
+                self._unindex(*found)
+
+    def outline(self, roots: list[tuple[Path, str]], path: str, text: str) -> list[Symbol]:
+        """Outline of ``text``, the current content of ``path`` — precomputed when the index has that version."""
+        with self._lock:
+            indexed = [
+                (base.texts.get(path), base.outlines.get(path))
+                for base in (self._bases.get(directory) for directory, _prefix in roots)
+                if base is not None
+            ]
+        for indexed_text, symbols in indexed:
+            if indexed_text == text:
+                return symbols
+        return outline(path, text)
+
+    def search(
+        self,
+        roots: list[tuple[Path, str]],
+        query: str,
+        *,
+        regex: bool = False,
+        prefixes: tuple[str, ...] = ("",),
+        max_hits: int = 20,
+    ) -> dict:
+        """Ranked line matches for query across roots. Case-insensitive; raises re.error for a bad regex."""
+        matcher = re.compile(query if regex else re.escape(query), re.IGNORECASE)
+        literals = _literal_runs(query) if regex else [query]
+
+        grams = set().union(*(_trigrams(lit.lower()) for lit in literals or ()))
+        candidates: list[tuple[str, str]] = []  # (path, text); texts are immutable, so this is a snapshot
+        for directory, prefix in roots:
+            if not directory.exists():
+                continue
+            base = self._base(directory, prefix)
+            with self._lock:
+                if grams:
+                    # Intersect smallest posting lists first; a missing trigram means no candidates
+                    postings = sorted((base.postings.get(g, set()) for g in grams), key=len)
+                    paths = set(postings[0]).intersection(*postings[1:])
+                else:
+                    paths = base.texts.keys()
+                candidates.extend((path, base.texts[path]) for path in paths if path.startswith(prefixes))
+
+        # Files named after the query first, then code before prose — also the order the scan cap cuts in
+        candidates.sort(key=lambda c: (not matcher.search(c[0]), c[0].endswith(".md"), c[0]))
+        ranked = []
+        scanned = 0
+        capped = False
+        for path, text in candidates:
+            lines = text.splitlines()
+            scanned += len(lines)
+            if scanned > MAX_SCANNED_LINES:
+                capped = True
+                break
+            hits = [n for n, line in enumerate(lines, 1) if matcher.search(line)]
+            if hits:
+                rank = (not matcher.search(path), path.endswith(".md"), -len(hits), path)
+                ranked.append((rank, path, lines, hits))
+
+        ranked.sort(key=lambda r: r[0])
+        matches = []
+        for _rank, path, lines, hits in ranked:
+            for n in hits[:HITS_PER_FILE]:
+                context = range(max(n - 1, 1), min(n + 1, len(lines)) + 1)
+                matches.append({
+                    "filePath": path,
+                    "line": n,
+                    "snippet": "\n".join(f"{i}: {lines[i - 1][:MAX_SNIPPET_LINE_CHARS]}" for i in context),
+                })
+        return {
+            "matches": matches[:max_hits],
+            "totalMatches": sum(len(r[3]) for r in ranked),
+            "filesMatched": len(ranked),
+            "truncated": capped or len(matches) > max_hits or any(len(r[3]) > HITS_PER_FILE for r in ranked),
+        }
+
+
+code_index = CodeIndex()
@@ -7,4 +7,89 @@ POSTHOG_PERSONAL_API_KEY = os.environ.get("POSTHOG_PERSONAL_API_KEY", "")
 POSTHOG_PROJECT_ID = os.environ.get("POSTHOG_PROJECT_ID", "")
 POSTHOG_HOST = os.environ.get("POSTHOG_HOST", "https://us.i.posthog.com")
 
+# Shared PostHog HTTP client (see agent/posthog.py)
+POSTHOG_HTTP2 = os.environ.get("POSTHOG_HTTP2", "").lower() in ("1", "true", "yes")
+POSTHOG_MAX_CONNECTIONS = int(os.environ.get("POSTHOG_MAX_CONNECTIONS", "20"))
+POSTHOG_MAX_KEEPALIVE = int(os.environ.get("POSTHOG_MAX_KEEPALIVE", "10"))
+POSTHOG_KEEPALIVE_EXPIRY = float(os.environ.get("POSTHOG_KEEPALIVE_EXPIRY", "30"))
+POSTHOG_CONNECT_TIMEOUT = float(os.environ.get("POSTHOG_CONNECT_TIMEOUT", "3"))
+POSTHOG_READ_TIMEOUT = float(os.environ.get("POSTHOG_READ_TIMEOUT", "10"))
+
+# Per-session event timeline cache (see agent/event_cache.py)
+EVENT_CACHE_TTL_SECONDS = float(os.environ.get("EVENT_CACHE_TTL_SECONDS", "15"))
+EVENT_CACHE_MAX_BYTES = int(os.environ.get("EVENT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Upper bound on tool calls from a single model step that run at the same time
+MAX_CONCURRENT_TOOLS = int(os.environ.get("MAX_CONCURRENT_TOOLS", "4"))
+
+# Start the standard first tool calls (events, business rules, snapshot file reads) as soon as
+# a request arrives, instead of waiting for the model to ask for them
+AGENT_PREFETCH = os.environ.get("AGENT_PREFETCH", "1").lower() in ("1", "true", "yes")
+# codebaseSnapshotPaths read speculatively per request
+PREFETCH_MAX_SOURCE_FILES = int(os.environ.get("PREFETCH_MAX_SOURCE_FILES", "3"))
+
+# Worker threads for blocking file I/O (source reads, rules search, uploads, tree walks)
+FILE_IO_WORKERS = int(os.environ.get("FILE_IO_WORKERS", "8"))
+# Archive uploads extracting at once; each holds a thread of its own for the whole upload
+ARCHIVE_EXTRACT_WORKERS = int(os.environ.get("ARCHIVE_EXTRACT_WORKERS", "2"))
+
+# readSourceFile results kept in memory (LRU), bounded by count and by total size
+SOURCE_CACHE_MAX_ENTRIES = int(os.environ.get("SOURCE_CACHE_MAX_ENTRIES", "256"))
+SOURCE_CACHE_MAX_BYTES = int(os.environ.get("SOURCE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Business-rules sections returned per searchBusinessRules call
+RULES_SEARCH_TOP_K = int(os.environ.get("RULES_SEARCH_TOP_K", "3"))
+
+# Upper bound on file/line matches returned per searchCode call
+CODE_SEARCH_MAX_HITS = int(os.environ.get("CODE_SEARCH_MAX_HITS", "20"))
+
+# Optional batching of SSE text-delta frames; 0 ms sends every model delta as its own frame
+SSE_COALESCE_MS = float(os.environ.get("SSE_COALESCE_MS", "0"))
+SSE_COALESCE_BYTES = int(os.environ.get("SSE_COALESCE_BYTES", "512"))
+
+# Token budget for the per-request part of the system prompt (logs, events, page snapshot);
+# counted at ~4 characters per token unless tiktoken is installed (see agent/context.py)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "4000"))
+
+# History compaction between agent steps (see agent/history.py)
+HISTORY_VERBATIM_STEPS = int(os.environ.get("HISTORY_VERBATIM_STEPS", "1"))
+HISTORY_TOKEN_THRESHOLD = int(os.environ.get("HISTORY_TOKEN_THRESHOLD", "12000"))
+
+# Shared investigations for identical auto-triggered errors (see agent/diagnosis.py)
+DIAGNOSIS_CACHE_TTL_SECONDS = float(os.environ.get("DIAGNOSIS_CACHE_TTL_SECONDS", "300"))
+DIAGNOSIS_CACHE_MAX_ENTRIES = int(os.environ.get("DIAGNOSIS_CACHE_MAX_ENTRIES", "256"))
+
+# "openai", or "stub" for the offline scripted provider used by bench/ (see agent/providers.py)
+MODEL_PROVIDER = os.environ.get("MODEL_PROVIDER", "openai")
+STUB_TOKENS_PER_SECOND = float(os.environ.get("STUB_TOKENS_PER_SECOND", "100"))
+STUB_SCRIPT_PATH = os.environ.get("STUB_SCRIPT_PATH", "")
+
+# Admission control for /api/fde/stream (see agent/admission.py)
+AGENT_MAX_ACTIVE_SESSIONS = int(os.environ.get("AGENT_MAX_ACTIVE_SESSIONS", "32"))
+AGENT_MAX_QUEUED_SESSIONS = int(os.environ.get("AGENT_MAX_QUEUED_SESSIONS", "64"))
+AGENT_MAX_SESSIONS_PER_ID = int(os.environ.get("AGENT_MAX_SESSIONS_PER_ID", "2"))
+AGENT_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("AGENT_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Resumable agent streams (see agent/runs.py): replay buffer per messageId, kept after the run finishes
+REPLAY_TTL_SECONDS = float(os.environ.get("REPLAY_TTL_SECONDS", "120"))
+REPLAY_MAX_RUNS = int(os.environ.get("REPLAY_MAX_RUNS", "512"))
+REPLAY_BUFFER_MAX_BYTES = int(os.environ.get("REPLAY_BUFFER_MAX_BYTES", str(1024 * 1024)))
+# Across all finished runs; the oldest are dropped first (live runs are bounded by admission)
+REPLAY_MAX_TOTAL_BYTES = int(os.environ.get("REPLAY_MAX_TOTAL_BYTES", str(64 * 1024 * 1024)))
+# How long a run keeps going with no client attached, waiting for a resume
+RESUME_GRACE_SECONDS = float(os.environ.get("RESUME_GRACE_SECONDS", "15"))
+
+# Server-side chat transcripts for clients that send only new turns (see agent/transcripts.py)
+TRANSCRIPT_MAX_CONVERSATIONS = int(os.environ.get("TRANSCRIPT_MAX_CONVERSATIONS", "1000"))
+TRANSCRIPT_MAX_MESSAGES = int(os.environ.get("TRANSCRIPT_MAX_MESSAGES", "100"))
+TRANSCRIPT_TTL_SECONDS = float(os.environ.get("TRANSCRIPT_TTL_SECONDS", "3600"))
+
+# HTTP body compression (see compression.py): responses from this size up are compressed;
+# compressed request bodies may inflate to at most REQUEST_MAX_DECOMPRESSED_BYTES
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+REQUEST_MAX_DECOMPRESSED_BYTES = int(os.environ.get("REQUEST_MAX_DECOMPRESSED_BYTES", str(64 * 1024 * 1024)))
+
+# Log one structured "[timing]" line per agent session (metrics are always on /metrics)
+LOG_STREAM_TIMINGS = os.environ.get("LOG_STREAM_TIMINGS", "").lower() in ("1", "true", "yes")
+
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from functools import cache
+
+from agent.models import LogEntry
+
+# tiktoken is deliberately not a dependency: its encodings are downloaded on
+# first use, which the offline image can't do, and the budget only needs to
+# be roughly right. Installed (with its cache) it makes the counts exact.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Longest single log message kept verbatim
+MAX_LOG_MESSAGE_CHARS = 500
+# Longest client-supplied free text (error message, element text, a file path) kept verbatim
+MAX_FIELD_CHARS = 500
+# Snapshot paths listed in the prompt at most, however many the client sends
+MAX_SNAPSHOT_PATHS = 50
+
+_LEVEL_WEIGHT = {"error": 3, "fatal": 3, "warn": 2, "warning": 2, "info": 1}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@cache
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # encoding files unavailable (e.g. offline container)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text: exact with tiktoken, otherwise estimated at four characters per token."""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class ContextBudget:
+    """Token allowance for the per-request sections of the system prompt."""
+
+    limit: int
+    used: int = 0
+    dropped: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+    def take(self, text: str) -> bool:
+        """Reserve room for text; False (and nothing reserved) if it doesn't fit."""
+        tokens = count_tokens(text)
+        if self.used + tokens > self.limit:
+            return False
+        self.used += tokens
+        return True
+
+    def drop(self, section: str, count: int = 1) -> None:
+        self.dropped[section] = self.dropped.get(section, 0) + count
+
+
+def select_log_lines(entries: list[LogEntry], budget: ContextBudget, section: str) -> list[str]:
+    """Collapse repeated messages, then keep errors and recent lines first.
+
+    Kept lines are returned in their original (chronological) order.
+    """
+    groups: dict[tuple[str, str], dict] = {}
+    for i, entry in enumerate(entries):
+        key = (entry.level.lower(), entry.message)
+        group = groups.setdefault(key, {"entry": entry, "count": 0})
+        group["entry"] = entry  # latest occurrence
+        group["last"] = i
+        group["count"] += 1
+
+    ranked = sorted(
+        groups.values(),
+        key=lambda g: (-_LEVEL_WEIGHT.get(g["entry"].level.lower(), 0), -g["last"]),
+    )
+
+    kept = []
+    for group in ranked:
+        entry = group["entry"]
+        message = entry.message
+        if len(message) > MAX_LOG_MESSAGE_CHARS:
+            message = message[:MAX_LOG_MESSAGE_CHARS] + "…"
+        line = f"  [{entry.timestamp}] {entry.level}: {message}"
+        if group["count"] > 1:
+            line += f" (×{group['count']})"
+        if budget.take(line):
+            kept.append((group["last"], line))
+        else:
+            budget.drop(section, group["count"])
+
+    duplicates = len(entries) - len(groups)
+    if duplicates:
+        budget.drop(f"{section} (collapsed repeats)", duplicates)
+    return [line for _, line in sorted(kept)]
+
+
+def clip(text: str, limit: int = MAX_FIELD_CHARS) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def select_paths(paths: list[str], budget: ContextBudget, section: str) -> list[str]:
+    """List lines for the first distinct paths that fit, up to MAX_SNAPSHOT_PATHS."""
+    distinct = list(dict.fromkeys(paths))
+    kept = []
+    for path in distinct[:MAX_SNAPSHOT_PATHS]:
+        line = f"- {clip(path)}"
+        if not budget.take(line):
+            break
+        kept.append(line)
+    if len(kept) < len(distinct):
+        budget.drop(section, len(distinct) - len(kept))
+    return kept
+
+
+def select_recent(items: list[dict], budget: ContextBudget, section: str) -> list[str]:
+    """Compact JSON lines for the newest items that fit, in chronological order."""
+    kept = []
+    for i in range(len(items) - 1, -1, -1):
+        line = "- " + json.dumps(items[i], separators=(",", ":"), default=str)
+        if not budget.take(line):
+            budget.drop(section, i + 1)
+            break
+        kept.append(line)
+    kept.reverse()
+    return kept
+
+
+def page_text_excerpt(html: str, budget: ContextBudget, max_tokens: int, section: str) -> str:
+    """Visible text of a page snapshot, cut to what the budget allows."""
+    text = _SPACE_RE.sub(" ", _TAG_RE.sub(" ", html)).strip()
+    allowance = min(max_tokens, budget.remaining) - 2  # room for the trailing ellipsis
+    if not text or allowance <= 0:
+        if text:
+            budget.drop(section)
+        return ""
+    excerpt = text
+    if count_tokens(excerpt) > allowance:
+        # Shrink proportionally until it fits; converges in a step or two
+        while excerpt and count_tokens(excerpt) > allowance:
+            excerpt = excerpt[: int(len(excerpt) * allowance / count_tokens(excerpt) * 0.95)]
+        budget.drop(f"{section} (truncated chars)", len(text) - len(excerpt))
+        excerpt += " …"
+    budget.take(excerpt)
+    return excerpt
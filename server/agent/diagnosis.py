@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+
+from agent.config import DIAGNOSIS_CACHE_MAX_ENTRIES, DIAGNOSIS_CACHE_TTL_SECONDS
+from agent.models import FDERequest
+from agent.runs import AgentRun, run_registry
+
+logger = logging.getLogger("relay")
+
+_UUID_RE = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+_HEX_RE = re.compile(r"\b[0-9a-f]{8,}\b")
+_NUMBER_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+# Tools whose input and output describe the requesting user's own session
+SESSION_TOOLS = frozenset({"getUserEvents"})
+_REDACTED_OUTPUT = {"redacted": "Another user's session events, not shown."}
+
+
+def error_signature(req: FDERequest) -> str | None:
+    """Cache key for an auto-triggered error chat's opening turn, or None if not cacheable.
+
+    IDs and numbers are masked so "ORD-001" and "ORD-042" failing the same way
+    share one investigation.
+    """
+    if not req.autoTriggered or not req.errorMessage:
+        return None
+    if sum(1 for m in req.messages if m.role == "user") > 1:
+        return None  # follow-up turns depend on the conversation so far
+    message = req.errorMessage.lower()
+    message = _UUID_RE.sub("#", message)
+    message = _HEX_RE.sub("#", message)
+    message = _NUMBER_RE.sub("#", message)
+    message = _SPACE_RE.sub(" ", message).strip()
+    selector = req.elementContext.cssSelector if req.elementContext else ""
+    return f"{message}|{selector}"
+
+
+async def _redact_session_data(run: AgentRun, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+    """``frames`` with SESSION_TOOLS inputs and outputs blanked, for anyone but the run's originator.
+
+    A tool call is only shown if its tool-input-start names a tool outside
+    SESSION_TOOLS; call ids are learned from everything the run has recorded,
+    so a resume that starts mid-run is redacted too.
+    """
+    shown: set[str] = set()
+
+    def learn(event: dict) -> None:
+        if event.get("type") == "tool-input-start" and event.get("toolName") not in SESSION_TOOLS:
+            shown.add(event["toolCallId"])
+
+    for frame in list(run.frames):
+        if '"tool-input-start"' in frame:
+            learn(json.loads(frame.split("data: ", 1)[1]))
+
+    async for frame in frames:
+        if '"type": "tool-' not in frame:
+            yield frame
+            continue
+        header, payload = frame.split("data: ", 1)
+        event = json.loads(payload)
+        learn(event)
+        if event.get("toolCallId") in shown:
+            yield frame
+            continue
+        if event["type"] == "tool-input-available":
+            event["input"] = {}
+        elif event["type"] == "tool-output-available":
+            event["output"] = _REDACTED_OUTPUT
+        yield f"{header}data: {json.dumps(event)}\n\n"
+
+
+async def _recording_answer(frames: AsyncIterator[str], on_answer: Callable[[str], None]) -> AsyncIterator[str]:
+    """``frames`` unchanged; ``on_answer`` gets their text once they end, however they end.
+
+    One text part per text id, joined the way run_fde_stream joins its steps.
+    """
+    parts: dict[str, list[str]] = {}
+    try:
+        async for frame in frames:
+            if '"type": "text-delta"' in frame:
+                event = json.loads(frame.split("data: ", 1)[1])
+                parts.setdefault(event["id"], []).append(event["delta"])
+            yield frame
+    finally:
+        on_answer("\n".join("".join(deltas) for deltas in parts.values()))
+
+
+class DiagnosisCache:
+    """Single-flight + TTL cache of agent runs for identical auto-triggered errors.
+
+    The first request for an error signature starts the agent; concurrent and
+    later requests (within ``ttl`` of a clean finish) replay its frames instead,
+    so the investigation — and its classifyIssue report — happens once. Every
+    other request gets a run of its own. Runs are started through the resumable
+    run registry (see agent/runs.py) either way.
+
+    Only the request that started a shared run sees its per-session tool
+    calls (SESSION_TOOLS) in full; replays and resumes get them redacted.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._runs: OrderedDict[str, AgentRun] = OrderedDict()
+
+    def _reusable(self, run: AgentRun) -> bool:
+        if not run.complete:
+            return False  # the start of the answer is no longer recorded
+        if not run.done:
+            return not run.failed
+        return not run.failed and time.monotonic() - run.finished_at < self.ttl
+
+    def reuses(self, req: FDERequest) -> bool:
+        """Whether stream() would replay an existing run rather than start one."""
+        key = error_signature(req)
+        run = self._runs.get(key) if key is not None else None
+        return run is not None and self._reusable(run)
+
+    def stream(
+        self,
+        req: FDERequest,
+        start: Callable[[FDERequest], AsyncIterator[str]],
+        on_answer: Callable[[str], None] | None = None,
+    ) -> AsyncIterator[str]:
+        """Frames answering req. ``on_answer`` gets the answer text when it is replayed from
+        another request's run, since ``start`` (which records its own answer) never runs then."""
+        key = error_signature(req)
+        if key is None:
+            return run_registry.start(start(req)).subscribe()
+
+        run = self._runs.get(key)
+        if run is not None and self._reusable(run):
+            self.hits += 1
+            self._runs.move_to_end(key)
+            logger.info("[diagnosis] Reusing %s investigation for %r", "live" if not run.done else "cached", key)
+            frames = _redact_session_data(run, run.subscribe())
+            return _recording_answer(frames, on_answer) if on_answer is not None else frames
+
+        self.misses += 1
+        run = run_registry.start(start(req))
+        self._runs[key] = run
+        self._runs.move_to_end(key)
+        while len(self._runs) > self.max_entries:
+            self._runs.popitem(last=False)
+        return run.subscribe()
+
+    def resume(self, run: AgentRun, after: int) -> AsyncIterator[str]:
+        """Frames after ``after`` for a resuming client, which can't be told apart from a replaying one."""
+        if any(shared is run for shared in self._runs.values()):
+            return _redact_session_data(run, run.subscribe(after))
+        return run.subscribe(after)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._runs), "hits": self.hits, "misses": self.misses}
+
+
+diagnosis_cache = DiagnosisCache(DIAGNOSIS_CACHE_TTL_SECONDS, DIAGNOSIS_CACHE_MAX_ENTRIES)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from agent.config import EVENT_CACHE_MAX_BYTES, EVENT_CACHE_TTL_SECONDS
+from agent.posthog import EVENT_LIMIT, fetch_session_events
+
+logger = logging.getLogger("relay")
+
+
+@dataclass
+class _Entry:
+    events: list[dict]  # raw PostHog events, newest first, at most EVENT_LIMIT
+    fetched_at: float
+    size: int  # approximate bytes, for the memory cap
+
+    @property
+    def latest_timestamp(self) -> str | None:
+        return max((str(e.get("timestamp", "")) for e in self.events), default=None) or None
+
+
+def _event_key(event: dict) -> str:
+    return str(event.get("uuid") or event.get("id") or (event.get("timestamp"), event.get("event")))
+
+
+class EventCache:
+    """Per-session cache of PostHog event windows.
+
+    Entries are fresh for ``ttl`` seconds. A stale entry is refreshed by asking
+    PostHog only for events after its newest timestamp and merging them in.
+    Concurrent lookups for one session share a single in-flight request, and
+    least recently used sessions are dropped once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._bytes = 0
+
+    async def get(self, session_id: str) -> list[dict]:
+        entry = self._entries.get(session_id)
+        if entry is not None and time.monotonic() - entry.fetched_at < self.ttl:
+            self._entries.move_to_end(session_id)
+            return entry.events
+
+        task = self._inflight.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(session_id, entry))
+            self._inflight[session_id] = task
+            task.add_done_callback(lambda t: self._settle(session_id, t))
+        # Shield so one cancelled caller doesn't abort the fetch for the others
+        return await asyncio.shield(task)
+
+    def _settle(self, session_id: str, task: asyncio.Task) -> None:
+        if self._inflight.get(session_id) is task:
+            del self._inflight[session_id]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    async def _refresh(self, session_id: str, entry: _Entry | None) -> list[dict]:
+        if entry is None:
+            events = await fetch_session_events(session_id)
+        else:
+            try:
+                newer = await fetch_session_events(session_id, after=entry.latest_timestamp)
+            except Exception as e:
+                logger.warning("[events] Refresh failed for %s, serving cached window: %s", session_id, e)
+                return entry.events
+            seen = {_event_key(e) for e in entry.events}
+            fresh = [e for e in newer if _event_key(e) not in seen]
+            events = (fresh + entry.events)[:EVENT_LIMIT]
+
+        self._store(session_id, events)
+        return events
+
+    def _store(self, session_id: str, events: list[dict]) -> None:
+        old = self._entries.pop(session_id, None)
+        if old is not None:
+            self._bytes -= old.size
+        size = len(json.dumps(events, default=str))
+        self._entries[session_id] = _Entry(events, time.monotonic(), size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def invalidate(self, session_id: str | None = None) -> None:
+        if session_id is None:
+            self._entries.clear()
+            self._bytes = 0
+        else:
+            old = self._entries.pop(session_id, None)
+            if old is not None:
+                self._bytes -= old.size
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._entries),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "inflight": len(self._inflight),
+        }
+
+
+event_cache = EventCache(EVENT_CACHE_TTL_SECONDS, EVENT_CACHE_MAX_BYTES)
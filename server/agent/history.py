@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+
+from agent.context import count_tokens
+
+logger = logging.getLogger("relay")
+
+# Marker key that tells a digest apart from a real tool output
+DIGEST_KEY = "compacted"
+
+_SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function|class|const|def|interface|type)\s+([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+
+
+def _digest_events(output: dict, _arguments: dict) -> dict:
+    events = output.get("events", [])
+    return {
+        "events": [
+            f"{e.get('timestamp', '')} {e.get('event', '')}: {e.get('description', '')}"
+            + (" [error]" if e.get("isError") else "")
+            for e in events
+        ],
+    }
+
+
+def _digest_source(output: dict, arguments: dict) -> dict:
+    content = str(output.get("content", ""))
+    digest = {
+        "filePath": arguments.get("filePath", ""),
+        "lines": content.count("\n") + 1,
+        "symbols": list(dict.fromkeys(_SYMBOL_RE.findall(content)))[:30],
+    }
+    if "startLine" in output:
+        digest["range"] = f"{output['startLine']}-{output['endLine']}"
+    return digest
+
+
+def _digest_search(output: dict, arguments: dict) -> dict:
+    return {
+        "query": arguments.get("query", ""),
+        "matches": [f"{m.get('filePath', '')}:{m.get('line', '')}" for m in output.get("matches", [])],
+    }
+
+
+def _digest_rules(output: dict, arguments: dict) -> dict:
+    rules = str(output.get("rules", ""))
+    return {
+        "query": arguments.get("query", ""),
+        "sections": [line.lstrip("# ").strip() for line in rules.splitlines() if line.startswith("## ")],
+    }
+
+
+_DIGESTERS = {
+    "getUserEvents": _digest_events,
+    "readSourceFile": _digest_source,
+    "searchCode": _digest_search,
+    "searchBusinessRules": _digest_rules,
+}
+
+
+def _digest(name: str, arguments: dict, content: str) -> str | None:
+    """Short structured stand-in for a tool output, or None to keep it as is."""
+    digester = _DIGESTERS.get(name)
+    if digester is None:
+        return None  # classifyIssue and friends are already small
+    try:
+        output = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    digest = {
+        DIGEST_KEY: True,
+        "tool": name,
+        "note": "Earlier output summarized to save context; call the tool again if you need the full result.",
+        **digester(output, arguments),
+    }
+    compacted = json.dumps(digest)
+    return compacted if len(compacted) < len(content) else None
+
+
+def _is_digest(content: str) -> bool:
+    return content.startswith('{"' + DIGEST_KEY + '": true')
+
+
+def compact_history(messages: list[dict], *, keep_steps: int, max_tokens: int) -> None:
+    """Replace older tool outputs in an OpenAI message list with digests, in place.
+
+    Tool results from the last ``keep_steps`` assistant turns stay verbatim;
+    older ones have already been seen by a later model call. If the history is
+    still over ``max_tokens``, everything but the latest turn's results is
+    digested too.
+    """
+    # (assistant message index, {tool_call_id: (name, arguments)}) per tool-calling turn
+    turns: list[tuple[int, dict[str, tuple[str, dict]]]] = []
+    for i, message in enumerate(messages):
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            calls = {}
+            for tc in message["tool_calls"]:
+                try:
+                    arguments = json.loads(tc["function"]["arguments"] or "{}")
+                except json.JSONDecodeError:
+                    arguments = {}
+                calls[tc["id"]] = (tc["function"]["name"], arguments)
+            turns.append((i, calls))
+    if len(turns) <= 1:
+        return
+
+    def compact_turns(selected: list[tuple[int, dict]]) -> int:
+        saved = 0
+        for start, calls in selected:
+            for message in messages[start + 1:]:
+                if message.get("role") != "tool":
+                    break
+                call = calls.get(message.get("tool_call_id"))
+                content = message.get("content", "")
+                if call is None or _is_digest(content):
+                    continue
+                digest = _digest(call[0], call[1], content)
+                if digest is not None:
+                    saved += len(content) - len(digest)
+                    message["content"] = digest
+        return saved
+
+    saved = compact_turns(turns[:-max(keep_steps, 1)])
+    if sum(count_tokens(str(m.get("content") or "")) for m in messages) > max_tokens:
+        saved += compact_turns(turns[:-1])
+    if saved:
+        logger.info("[history] Compacted older tool outputs — %d chars saved", saved)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from agent import metrics
+from agent.config import ARCHIVE_EXTRACT_WORKERS, FILE_IO_WORKERS
+
+T = TypeVar("T")
+
+# Separate from the default executor (asyncio.to_thread), so a burst of disk
+# work can't starve database calls, and vice versa
+_executor = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix="relay-io")
+# Jobs that hold a thread for a whole request get their own, so they can't take over the pool above
+_extract_executor = ThreadPoolExecutor(max_workers=ARCHIVE_EXTRACT_WORKERS, thread_name_prefix="relay-extract")
+
+
+async def run_io(op: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking file I/O ``fn`` on the bounded worker pool, off the event loop.
+
+    ``op`` labels the queue-time and run-time metrics, e.g. "read_source".
+    """
+    return await _run(_executor, op, fn, args, kwargs)
+
+
+async def run_extraction(op: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Like run_io, for a job that runs as long as an upload's body (archive extraction)."""
+    return await _run(_extract_executor, op, fn, args, kwargs)
+
+
+async def _run(executor: ThreadPoolExecutor, op: str, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+    submitted = time.perf_counter()
+    metrics.io_pending.inc()
+
+    def job() -> T:
+        started = time.perf_counter()
+        metrics.io_queue_seconds.observe(started - submitted, op=op)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.io_run_seconds.observe(time.perf_counter() - started, op=op)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, job)
+    finally:
+        metrics.io_pending.inc(-1)
@@ -1,96 +1,148 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
 import logging
+import time
 import uuid
-from collections.abc import AsyncGenerator
-
-from openai import AsyncOpenAI
-
-from agent.config import OPENAI_API_KEY
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+
+from agent import metrics
+from agent.config import (
+    AGENT_PREFETCH,
+    CONTEXT_TOKEN_BUDGET,
+    HISTORY_TOKEN_THRESHOLD,
+    HISTORY_VERBATIM_STEPS,
+    LOG_STREAM_TIMINGS,
+    MAX_CONCURRENT_TOOLS,
+    RESUME_GRACE_SECONDS,
+    SSE_COALESCE_BYTES,
+    SSE_COALESCE_MS,
+)
+from agent.context import ContextBudget, clip, page_text_excerpt, select_log_lines, select_paths, select_recent
+from agent.history import compact_history
 from agent.models import ChatMessage, FDERequest
+from agent.prefetch import Prefetch, speculative_calls
+from agent.providers import get_provider
 from agent.tools import TOOL_DEFINITIONS, execute_tool
 
 logger = logging.getLogger("relay")
 
 MAX_STEPS = 5
-
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+MODEL = "gpt-4.1"
+
+# Tools with side effects — never run alongside another call of the same kind
+SERIAL_TOOLS = frozenset({"classifyIssue"})
+
+
+# Identical for every request and placed first, so the provider's prompt-prefix cache applies
+SYSTEM_INSTRUCTIONS = (
+    "You are Relay — an empathetic, proactive customer success agent embedded in a web application. "
+    "Your role is to help users who encounter problems by investigating the root cause, "
+    "explaining what went wrong in plain language, and proactively suggesting how to solve or work around the issue.\n\n"
+    "## Personality\n"
+    "- Lead with empathy. Acknowledge frustration before investigating.\n"
+    "- Never use technical jargon with users. Speak plainly and warmly.\n"
+    "- Be proactive — don't just explain the problem, offer a solution or workaround.\n"
+    "- Investigate before asking — use your tools to gather context first, then ask the user only if needed.\n"
+    "- Be concise. Users are frustrated; don't make them read walls of text.\n\n"
+    "## Investigation Process\n"
+    "1. Check the user's recent events with getUserEvents to understand what they did.\n"
+    "2. Search business rules with searchBusinessRules to check if the behavior is intentional.\n"
+    "   If the results of steps 1 and 2 are already in the conversation, don't repeat those calls.\n"
+    "3. Find the relevant code with searchCode — search for the error message, error code or "
+    "function name — instead of guessing file paths.\n"
+    "4. Read source code with readSourceFile to understand the implementation — check both "
+    "frontend code (app/, components/, lib/) and backend code (server/, app/api/) to fully "
+    "understand the logic. For example, API routes live in app/api/ and server logic in server/.\n"
+    "5. Once you understand the issue, proactively help the user:\n"
+    "   - If it's a user error, explain what they need to do differently and guide them step by step.\n"
+    "   - If it's a bug or limitation, explain what's happening and suggest a workaround if one exists.\n"
+    "   - If the issue requires an engineering fix, classify it with classifyIssue and let the user know.\n\n"
+    "## Classification Guidelines\n"
+    "- **bug**: The code does something it shouldn't. Broken logic, crashes, wrong data.\n"
+    "- **ux_issue**: The code works as designed, but the design creates confusion or frustration.\n"
+    "- **edge_case**: A scenario the code doesn't handle well. Not broken, but not graceful either.\n\n"
+    "After classifying, give the user a brief, friendly summary of what you found, what they can do "
+    "right now (if anything), and that the engineering team has been notified for a permanent fix."
+)
+
+# Share of CONTEXT_TOKEN_BUDGET the page snapshot excerpt may use
+PAGE_SNAPSHOT_SHARE = 0.25
 
 
 def build_system_prompt(req: FDERequest) -> str:
-    prompt = (
-        "You are Relay — an empathetic, proactive customer success agent embedded in a web application. "
-        "Your role is to help users who encounter problems by investigating the root cause, "
-        "explaining what went wrong in plain language, and proactively suggesting how to solve or work around the issue.\n\n"
-        "## Personality\n"
-        "- Lead with empathy. Acknowledge frustration before investigating.\n"
-        "- Never use technical jargon with users. Speak plainly and warmly.\n"
-        "- Be proactive — don't just explain the problem, offer a solution or workaround.\n"
-        "- Investigate before asking — use your tools to gather context first, then ask the user only if needed.\n"
-        "- Be concise. Users are frustrated; don't make them read walls of text.\n\n"
-        "## Investigation Process\n"
-        "1. Check the user's recent events with getUserEvents to understand what they did.\n"
-        "2. Search business rules with searchBusinessRules to check if the behavior is intentional.\n"
-        "3. Read source code with readSourceFile to understand the implementation — check both "
-        "frontend code (app/, components/, lib/) and backend code (server/, app/api/) to fully "
-        "understand the logic. For example, API routes live in app/api/ and server logic in server/.\n"
-        "4. Once you understand the issue, proactively help the user:\n"
-        "   - If it's a user error, explain what they need to do differently and guide them step by step.\n"
-        "   - If it's a bug or limitation, explain what's happening and suggest a workaround if one exists.\n"
-        "   - If the issue requires an engineering fix, classify it with classifyIssue and let the user know.\n\n"
-        "## Classification Guidelines\n"
-        "- **bug**: The code does something it shouldn't. Broken logic, crashes, wrong data.\n"
-        "- **ux_issue**: The code works as designed, but the design creates confusion or frustration.\n"
-        "- **edge_case**: A scenario the code doesn't handle well. Not broken, but not graceful either.\n\n"
-        "After classifying, give the user a brief, friendly summary of what you found, what they can do "
-        "right now (if anything), and that the engineering team has been notified for a permanent fix."
-    )
-
-    if req.frontendLogs:
-        logs_text = "\n".join(
-            f"  [{l.timestamp}] {l.level}: {l.message}" for l in req.frontendLogs
-        )
-        prompt += f"\n\n## Frontend Logs\n```\n{logs_text}\n```"
-
-    if req.backendLogs:
-        logs_text = "\n".join(
-            f"  [{l.timestamp}] {l.level}: {l.message}" for l in req.backendLogs
-        )
-        prompt += f"\n\n## Backend Logs\n```\n{logs_text}\n```"
+    budget = ContextBudget(CONTEXT_TOKEN_BUDGET)
+    sections: list[str] = []
 
     if req.elementContext:
         ec = req.elementContext
-        prompt += (
-            f"\n\n## Element Context\n"
+        sections.append(
+            f"## Element Context\n"
             f"The user selected this element on the page:\n"
-            f"- Element: {ec.elementName}\n"
-            f"- CSS Selector: {ec.cssSelector}\n"
-            f"- Visible Text: {ec.visibleText}"
+            f"- Element: {clip(ec.elementName)}\n"
+            f"- CSS Selector: {clip(ec.cssSelector)}\n"
+            f"- Visible Text: {clip(ec.visibleText)}"
         )
 
     if req.errorMessage:
-        prompt += f'\n\n## Error Context\nAn error was detected on the page: "{req.errorMessage}"\n'
+        section = f'## Error Context\nAn error was detected on the page: "{clip(req.errorMessage)}"\n'
         if req.autoTriggered:
-            prompt += (
+            section += (
                 "The chat was auto-triggered by the error. "
                 "Start by acknowledging the error and investigating it immediately — "
                 "the user did not initiate this conversation, so be proactive."
             )
         else:
-            prompt += "The chat was manually opened by the user."
+            section += "The chat was manually opened by the user."
+        sections.append(section)
 
     if req.sessionId:
-        prompt += f'\n\n## Session\nThe user\'s PostHog session ID is: "{req.sessionId}". Use this when calling getUserEvents.'
+        sections.append(f'## Session\nThe user\'s PostHog session ID is: "{clip(req.sessionId)}". Use this when calling getUserEvents.')
+
+    # The sections above are small (their free text is clipped) and always kept; the rest share the budget
+    for section in sections:
+        budget.take(section)
 
     if req.codebaseSnapshotPaths:
-        prompt += (
-            "\n\n## Codebase Snapshot Paths\n"
-            "The following source files are relevant to this issue:\n"
-            + "\n".join(f"- {p}" for p in req.codebaseSnapshotPaths)
+        lines = select_paths(req.codebaseSnapshotPaths, budget, "Codebase Snapshot Paths")
+        if lines:
+            sections.append(
+                "## Codebase Snapshot Paths\n"
+                "The following source files are relevant to this issue:\n"
+                + "\n".join(lines)
+            )
+
+    # Logs come first in the prompt, as before, but are budgeted after the essentials
+    log_sections: list[str] = []
+    for title, entries in (("Frontend Logs", req.frontendLogs), ("Backend Logs", req.backendLogs)):
+        if entries:
+            lines = select_log_lines(entries, budget, title)
+            if lines:
+                log_sections.append(f"## {title}\n```\n" + "\n".join(lines) + "\n```")
+
+    if req.recentEvents:
+        lines = select_recent(req.recentEvents, budget, "Recent Events")
+        if lines:
+            sections.append("## Recent Events\nThe latest client-side events, oldest first:\n" + "\n".join(lines))
+
+    if req.pageSnapshot:
+        excerpt = page_text_excerpt(
+            req.pageSnapshot, budget, int(CONTEXT_TOKEN_BUDGET * PAGE_SNAPSHOT_SHARE), "Page Snapshot"
+        )
+        if excerpt:
+            sections.append(f"## Page Snapshot\nVisible text on the page when the chat opened:\n{excerpt}")
+
+    if budget.dropped:
+        logger.info(
+            "[context] Prompt context at %d/%d tokens — dropped %s",
+            budget.used,
+            budget.limit,
+            ", ".join(f"{name}: {count}" for name, count in budget.dropped.items()),
         )
 
-    return prompt
+    return "\n\n".join([SYSTEM_INSTRUCTIONS, *log_sections, *sections])
 
 
 def _data(payload: dict | str) -> str:
@@ -100,16 +152,276 @@ def _data(payload: dict | str) -> str:
     return f"data: {json.dumps(payload)}\n\n"
 
 
-async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
-    logger.info("[stream] Starting agent loop")
-    system_prompt = build_system_prompt(req)
-    message_id = f"msg_{uuid.uuid4().hex[:12]}"
+# -- Hot-path frames ---------------------------------------------------------
+# Byte-for-byte what _data() produces, without building a dict and running the
+# generic encoder for every token.
+
+_encode_str = json.encoder.encode_basestring_ascii  # the C escaper json.dumps uses
+
+_START_STEP = _data({"type": "start-step"})
+_FINISH_STEP = _data({"type": "finish-step"})
+_TEXT_START_PREFIX = 'data: {"type": "text-start", "id": '
+_TEXT_END_PREFIX = 'data: {"type": "text-end", "id": '
+_TEXT_DELTA_PREFIX = 'data: {"type": "text-delta", "id": '
+_DELTA_KEY = ', "delta": '
+_FRAME_END = "}\n\n"
+
+
+def _text_start(text_id: str) -> str:
+    return _TEXT_START_PREFIX + _encode_str(text_id) + _FRAME_END
+
+
+def _text_end(text_id: str) -> str:
+    return _TEXT_END_PREFIX + _encode_str(text_id) + _FRAME_END
+
+
+def _text_delta(text_id: str, delta: str) -> str:
+    return _TEXT_DELTA_PREFIX + _encode_str(text_id) + _DELTA_KEY + _encode_str(delta) + _FRAME_END
+
+
+class _DeltaCoalescer:
+    """Batches text-delta content for one text id into fewer SSE frames.
+
+    A batch is flushed once it is ``max_ms`` old or holds ``max_bytes`` of
+    UTF-8 text. Size is checked as deltas arrive; age also while the model is
+    quiet, by reading the stream through _with_flush_deadlines. Callers
+    flush() before emitting anything else. With ``max_ms`` <= 0 every delta is
+    its own frame.
+    """
+
+    def __init__(self, text_id: str, max_ms: float, max_bytes: int) -> None:
+        self.text_id = text_id
+        self.max_seconds = max_ms / 1000
+        self.max_bytes = max_bytes
+        self._parts: list[str] = []
+        self._size = 0
+        self._started = 0.0
+
+    def add(self, delta: str) -> str | None:
+        if self.max_seconds <= 0:
+            return _text_delta(self.text_id, delta)
+        if not self._parts:
+            self._started = time.monotonic()
+        self._parts.append(delta)
+        self._size += len(delta.encode())
+        if self._size >= self.max_bytes or time.monotonic() - self._started >= self.max_seconds:
+            return self.flush()
+        return None
+
+    def due_in(self) -> float | None:
+        """Seconds until the pending batch must go out, or None if nothing is pending."""
+        if not self._parts:
+            return None
+        return max(self._started + self.max_seconds - time.monotonic(), 0.0)
+
+    def flush(self) -> str | None:
+        if not self._parts:
+            return None
+        frame = _text_delta(self.text_id, "".join(self._parts))
+        self._parts.clear()
+        self._size = 0
+        return frame
+
+
+async def _with_flush_deadlines(stream: AsyncIterator, coalescer: _DeltaCoalescer) -> AsyncIterator:
+    """``stream``'s chunks, plus a None whenever the coalescer's batch falls due while no chunk arrives.
 
+    The pending read is never cancelled by a deadline, only waited on again.
+    When the caller stops early it is cancelled and waited for, so the stream
+    is no longer running by the time it gets closed.
+    """
+    chunks = stream.__aiter__()
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(chunks.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=coalescer.due_in())
+            if not done:
+                yield None
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield chunk
+    finally:
+        if pending is not None:
+            pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await pending
+
+
+def _schedule_tool_calls(
+    calls: list[tuple[str, dict]],
+    *,
+    element_context: str,
+    messages: list[ChatMessage],
+    timings: list[dict],
+) -> list[asyncio.Task]:
+    """Start every tool call from one step, returning tasks in call order.
+
+    Independent calls share a semaphore capped at MAX_CONCURRENT_TOOLS;
+    SERIAL_TOOLS take a lock so they run one at a time, in call order.
+    Each call's run time is appended to ``timings`` as it finishes.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOLS)
+    serial_lock = asyncio.Lock()
+
+    async def run(name: str, arguments: dict) -> dict:
+        guard = serial_lock if name in SERIAL_TOOLS else semaphore
+        async with guard:
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await execute_tool(
+                    name,
+                    arguments,
+                    element_context=element_context,
+                    messages=messages,
+                )
+                if "error" not in result:
+                    outcome = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.tool_seconds.observe(elapsed, tool=name)
+                metrics.tool_calls_total.inc(tool=name, outcome=outcome)
+                timings.append({"tool": name, "ms": round(elapsed * 1000, 1), "outcome": outcome})
+
+    return [asyncio.create_task(run(name, arguments)) for name, arguments in calls]
+
+
+def _tool_input_frames(tool_call_id: str, tool_name: str, arguments: dict) -> list[str]:
+    return [
+        _data({"type": "tool-input-start", "toolCallId": tool_call_id, "toolName": tool_name}),
+        _data({"type": "tool-input-available", "toolCallId": tool_call_id, "toolName": tool_name, "input": arguments}),
+    ]
+
+
+def _tool_call_message(calls: list[tuple[str, str, dict]]) -> dict:
+    """Assistant message requesting ``calls`` — (tool_call_id, name, arguments) — for the OpenAI history."""
+    return {
+        "role": "assistant",
+        "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for call_id, name, arguments in calls
+        ],
+    }
+
+
+async def _close_stream(stream) -> None:
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is not None:
+        await close()
+
+
+def _finish_step_timing(timing: dict, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    metrics.step_seconds.observe(elapsed, model=MODEL)
+    timing["stepMs"] = round(elapsed * 1000, 1)
+
+
+def _record_usage(usage, timing: dict) -> None:
+    """Count the token usage an include_usage chunk reports."""
+    counts = {
+        "prompt": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+    if cached:
+        counts["cached"] = cached
+    for kind, count in counts.items():
+        metrics.model_tokens_total.inc(count, model=MODEL, kind=kind)
+    timing["tokens"] = counts
+
+
+async def run_fde_stream(
+    req: FDERequest,
+    on_answer: Callable[[str], None] | None = None,
+) -> AsyncGenerator[str, None]:
+    """The agent loop's SSE frames, timed.
+
+    Time spent suspended at ``yield`` is time the server took to hand a frame
+    to the client, so it is tracked separately as SSE wait. The frames are
+    driven by an AgentRun (agent/runs.py), not by the response, so a client
+    disconnect does not stop the loop at once: the run keeps going for
+    RESUME_GRACE_SECONDS in case the client resumes, and only then is it
+    cancelled. The CancelledError lands wherever the loop is awaiting (model
+    stream, tool call) and unwinds it, cancelling pending tool tasks on the
+    way out.
+
+    ``on_answer`` receives the assistant's text once the stream ends, however
+    it ends.
+    """
+    timings: dict = {"steps": [], "prefetch": [], "error": False}
+    answer: list[str] = []
+    started = time.perf_counter()
+    sse_wait = 0.0
+    outcome = "ok"
+    frames = _agent_frames(req, timings, answer)
+    try:
+        async for frame in frames:
+            yielded = time.perf_counter()
+            yield frame
+            sse_wait += time.perf_counter() - yielded
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        logger.info(
+            "[stream] No client for %.0fs — cancelled messageId=%s after %d step(s)",
+            RESUME_GRACE_SECONDS,
+            timings.get("messageId"),
+            len(timings["steps"]),
+        )
+        raise
+    finally:
+        await frames.aclose()
+        if on_answer is not None:
+            on_answer("\n".join(answer))  # one text part per step, joined as ChatMessage does
+        if timings["error"]:
+            outcome = "error"
+        metrics.sse_wait_seconds.observe(sse_wait)
+        metrics.sessions_total.inc(outcome=outcome)
+        if LOG_STREAM_TIMINGS:
+            logger.info("[timing] %s", json.dumps({
+                "messageId": timings.get("messageId"),
+                "sessionId": req.sessionId,
+                "totalMs": round((time.perf_counter() - started) * 1000, 1),
+                "sseWaitMs": round(sse_wait * 1000, 1),
+                "outcome": outcome,
+                "prefetch": timings["prefetch"],
+                "steps": timings["steps"],
+            }))
+
+
+async def _agent_frames(req: FDERequest, timings: dict, answer: list[str]) -> AsyncGenerator[str, None]:
+    logger.info("[stream] Starting agent loop")
     element_context_str = ""
     if req.elementContext:
         ec = req.elementContext
         element_context_str = f"{ec.elementName} ({ec.cssSelector})"
 
+    # Start the lookups the model will ask for while the prompt is built and the model called
+    first_turn = not any(m.role == "assistant" for m in req.messages)
+    speculative = speculative_calls(req, first_turn=first_turn) if AGENT_PREFETCH else []
+    prefetch = Prefetch(
+        speculative,
+        _schedule_tool_calls(
+            speculative,
+            element_context=element_context_str,
+            messages=req.messages,
+            timings=timings["prefetch"],
+        ),
+        first_turn=first_turn,
+    )
+
+    system_prompt = build_system_prompt(req)
+    message_id = f"msg_{uuid.uuid4().hex[:12]}"
+    timings["messageId"] = message_id
+
     openai_messages: list[dict] = [
         {"role": "system", "content": system_prompt},
     ]
@@ -118,20 +430,56 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
 
     # Running counters for unique IDs
     text_counter = 0
-
-    yield _data({"type": "start", "messageId": message_id})
+    stream = None
+    chunks = None
 
     try:
+        yield _data({"type": "start", "messageId": message_id})
+
+        # Seeded first step: the prefetched events and rules, shown and recorded as tool calls
+        seeds = [(f"call_prefetch_{i}", name, arguments, task) for i, (name, arguments, task) in enumerate(prefetch.seeds())]
+        if seeds:
+            yield _START_STEP
+            for tool_call_id, name, arguments, _task in seeds:
+                for frame in _tool_input_frames(tool_call_id, name, arguments):
+                    yield frame
+            openai_messages.append(_tool_call_message([(call_id, name, args) for call_id, name, args, _ in seeds]))
+            try:
+                for tool_call_id, name, _arguments, task in seeds:
+                    try:
+                        result = await task
+                    except Exception as e:
+                        logger.warning("[prefetch] %s failed: %s", name, e)
+                        result = {"error": f"{name} failed: {e}"}
+                    yield _data({"type": "tool-output-available", "toolCallId": tool_call_id, "output": result})
+                    openai_messages.append({"role": "tool", "tool_call_id": tool_call_id, "content": json.dumps(result)})
+            finally:
+                for *_, task in seeds:
+                    task.cancel()
+            yield _FINISH_STEP
+
         for _step in range(MAX_STEPS):
-            yield _data({"type": "start-step"})
+            yield _START_STEP
 
+            compact_history(
+                openai_messages,
+                keep_steps=HISTORY_VERBATIM_STEPS,
+                max_tokens=HISTORY_TOKEN_THRESHOLD,
+            )
             logger.info("[stream] Step %d — calling OpenAI (%d messages)", _step + 1, len(openai_messages))
-            stream = await client.chat.completions.create(
-                model="gpt-4.1",
+            step_started = time.perf_counter()
+            step_timing: dict = {"step": _step + 1, "tools": []}
+            timings["steps"].append(step_timing)
+            stream = await get_provider().stream(
+                model=MODEL,
                 messages=openai_messages,
                 tools=TOOL_DEFINITIONS,
-                stream=True,
             )
+            elapsed = time.perf_counter() - step_started
+            metrics.model_request_seconds.observe(elapsed, model=MODEL)
+            step_timing["requestMs"] = round(elapsed * 1000, 1)
+            first_token = False
+            finish_reason = None
 
             # Accumulators for the streamed response
             text_buffer = ""
@@ -139,19 +487,38 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
             text_started = False
             text_counter += 1
             text_id = f"text-{text_counter}"
-
-            async for chunk in stream:
-                delta = chunk.choices[0].delta if chunk.choices else None
+            coalescer = _DeltaCoalescer(text_id, SSE_COALESCE_MS, SSE_COALESCE_BYTES)
+            chunks = _with_flush_deadlines(stream, coalescer) if coalescer.max_seconds > 0 else stream
+
+            async for chunk in chunks:
+                if chunk is None:  # the model went quiet with text batched up
+                    frame = coalescer.flush()
+                    if frame:
+                        yield frame
+                    continue
+                if chunk.usage:
+                    _record_usage(chunk.usage, step_timing)
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta
                 if delta is None:
                     continue
+                if not first_token and (delta.content or delta.tool_calls):
+                    first_token = True
+                    elapsed = time.perf_counter() - step_started
+                    metrics.model_first_token_seconds.observe(elapsed, model=MODEL)
+                    step_timing["firstTokenMs"] = round(elapsed * 1000, 1)
 
                 # Stream text content
                 if delta.content:
                     if not text_started:
-                        yield _data({"type": "text-start", "id": text_id})
+                        yield _text_start(text_id)
                         text_started = True
                     text_buffer += delta.content
-                    yield _data({"type": "text-delta", "id": text_id, "delta": delta.content})
+                    frame = coalescer.add(delta.content)
+                    if frame:
+                        yield frame
 
                 # Accumulate tool call fragments
                 if delta.tool_calls:
@@ -166,16 +533,22 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
                         if tc.function and tc.function.arguments:
                             tool_calls_acc[idx]["arguments_str"] += tc.function.arguments
 
+            elapsed = time.perf_counter() - step_started
+            metrics.model_stream_seconds.observe(elapsed, model=MODEL)
+            step_timing["streamMs"] = round(elapsed * 1000, 1)
+
             # Close text span if we started one
             if text_started:
-                yield _data({"type": "text-end", "id": text_id})
-
-            # Check finish reason
-            finish_reason = chunk.choices[0].finish_reason if chunk.choices else None
+                answer.append(text_buffer)
+                frame = coalescer.flush()
+                if frame:
+                    yield frame
+                yield _text_end(text_id)
 
             # If the model produced text only (no tool calls), finish step and done
             if not tool_calls_acc:
-                yield _data({"type": "finish-step"})
+                _finish_step_timing(step_timing, step_started)
+                yield _FINISH_STEP
                 break
 
             # Build the assistant message with tool calls for the conversation
@@ -198,7 +571,8 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
                 assistant_msg["tool_calls"] = assistant_tool_calls
             openai_messages.append(assistant_msg)
 
-            # Execute each tool call and emit events
+            # Announce every tool call, then run them concurrently
+            calls: list[tuple[str, str, dict]] = []  # (tool_call_id, name, arguments)
             for idx in sorted(tool_calls_acc):
                 tc_data = tool_calls_acc[idx]
                 tool_name = tc_data["name"]
@@ -207,41 +581,45 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
                     arguments = json.loads(tc_data["arguments_str"])
                 except json.JSONDecodeError:
                     arguments = {}
+                calls.append((tool_call_id, tool_name, arguments))
 
-                yield _data({
-                    "type": "tool-input-start",
-                    "toolCallId": tool_call_id,
-                    "toolName": tool_name,
-                })
-                yield _data({
-                    "type": "tool-input-available",
-                    "toolCallId": tool_call_id,
-                    "toolName": tool_name,
-                    "input": arguments,
-                })
+                for frame in _tool_input_frames(tool_call_id, tool_name, arguments):
+                    yield frame
 
                 logger.info("[stream] Executing tool %s(%s)", tool_name, json.dumps(arguments)[:200])
-                result = await execute_tool(
-                    tool_name,
-                    arguments,
-                    element_context=element_context_str,
-                    messages=req.messages,
-                )
-
-                yield _data({
-                    "type": "tool-output-available",
-                    "toolCallId": tool_call_id,
-                    "output": result,
-                })
-
-                # Feed tool result back into conversation
-                openai_messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call_id,
-                    "content": json.dumps(result),
-                })
 
-            yield _data({"type": "finish-step"})
+            # Calls a speculative lookup already covers reuse its task
+            prefetched = [prefetch.take(name, arguments) for _, name, arguments in calls]
+            scheduled = iter(_schedule_tool_calls(
+                [(name, arguments) for (_, name, arguments), task in zip(calls, prefetched) if task is None],
+                element_context=element_context_str,
+                messages=req.messages,
+                timings=step_timing["tools"],
+            ))
+            tasks = [task if task is not None else next(scheduled) for task in prefetched]
+            try:
+                # Emit results in call order, whatever order they finish in
+                for (tool_call_id, _, _), task in zip(calls, tasks):
+                    result = await task
+
+                    yield _data({
+                        "type": "tool-output-available",
+                        "toolCallId": tool_call_id,
+                        "output": result,
+                    })
+
+                    # Feed tool result back into conversation
+                    openai_messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call_id,
+                        "content": json.dumps(result),
+                    })
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            _finish_step_timing(step_timing, step_started)
+            yield _FINISH_STEP
 
             # If finish_reason was "stop" (not "tool_calls"), we're done
             if finish_reason == "stop":
@@ -249,7 +627,16 @@ async def run_fde_stream(req: FDERequest) -> AsyncGenerator[str, None]:
 
     except Exception as e:
         logger.error("[stream] Error: %s", e, exc_info=True)
+        timings["error"] = True
         yield _data({"type": "error", "error": str(e)})
+    finally:
+        # Also runs when an unwatched run is cancelled mid-step (CancelledError),
+        # so an abandoned model stream is closed instead of read to the end
+        if chunks is not None and chunks is not stream:
+            await _close_stream(chunks)  # cancels a read still waiting on the model
+        if stream is not None:
+            await _close_stream(stream)
+        prefetch.close()
 
     logger.info("[stream] Done — messageId=%s", message_id)
     yield _data({"type": "finish", "finishReason": "stop"})
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+
+# Latency buckets (seconds) shared by every histogram below: 5 ms .. 2 min
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()  # tools may observe from worker threads
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts incl. +Inf, sum)
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, math.inf), counts):
+                    cumulative += count
+                    le = 'le="' + _number(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total[0])}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# -- Agent loop ----------------------------------------------------------------
+
+model_request_seconds = Histogram(
+    "relay_model_request_seconds", "Time until the model provider accepted a streaming request.", ("model",)
+)
+model_first_token_seconds = Histogram(
+    "relay_model_first_token_seconds", "Time from the model request to its first streamed chunk.", ("model",)
+)
+model_stream_seconds = Histogram(
+    "relay_model_stream_seconds", "Time from the model request to the end of its stream.", ("model",)
+)
+model_tokens_total = Counter(
+    "relay_model_tokens_total", "Tokens reported by the model provider, by kind (prompt, completion, cached).",
+    ("model", "kind"),
+)
+tool_seconds = Histogram(
+    "relay_tool_seconds", "execute_tool run time, excluding time queued behind other calls.", ("tool",)
+)
+tool_calls_total = Counter("relay_tool_calls_total", "Tool calls by outcome (ok, error).", ("tool", "outcome"))
+step_seconds = Histogram("relay_step_seconds", "Agent step duration, model call through tool results.", ("model",))
+sse_wait_seconds = Histogram(
+    "relay_sse_wait_seconds", "Per-session time the agent loop spent blocked handing frames to the client."
+)
+sessions_total = Counter("relay_sessions_total", "Agent sessions by outcome (ok, error, cancelled).", ("outcome",))
+prefetch_total = Counter(
+    "relay_prefetch_total", "Speculative tool calls by outcome (seeded, answered, unused).", ("tool", "outcome")
+)
+
+# -- File I/O pool -------------------------------------------------------------
+
+io_pending = Gauge("relay_io_pending_jobs", "File I/O jobs waiting for or running on the worker pool.")
+io_queue_seconds = Histogram(
+    "relay_io_queue_seconds", "Time a file I/O job waited for a free worker thread.", ("op",)
+)
+io_run_seconds = Histogram("relay_io_run_seconds", "File I/O job run time on a worker thread.", ("op",))
+
+# -- Admission control ---------------------------------------------------------
+
+admission_active = Gauge("relay_admission_active_sessions", "Agent sessions currently running.")
+admission_queued = Gauge("relay_admission_queued_sessions", "Agent sessions waiting for a slot.")
+admission_wait_seconds = Histogram(
+    "relay_admission_wait_seconds", "Time an admitted agent session spent queued before starting."
+)
+admission_rejected_total = Counter(
+    "relay_admission_rejected_total", "Agent sessions turned away, by reason (queue_full, session_limit, timeout).",
+    ("reason",),
+)
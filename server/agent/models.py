@@ -57,6 +57,10 @@ class FDERequest(BaseModel):
     codebaseSnapshotPaths: list[str] = Field(default_factory=list)
     recentEvents: list[dict] = Field(default_factory=list)
     pageSnapshot: str = ""
+    # Transcript mode (see agent/transcripts.py): messages holds only the turns after the first
+    # baseMessageCount, which the server already has for this conversation
+    conversationId: str | None = None
+    baseMessageCount: int = Field(0, ge=0)
 
 
 # -- Report / timeline -------------------------------------------------------
@@ -71,7 +75,7 @@ class TimelineEvent(BaseModel):
     properties: dict | None = None
 
 
-class Report(BaseModel):
+class ReportSummary(BaseModel):
     id: str
     type: str  # "bug" | "edge_case" | "ux_issue"
     title: str
@@ -79,6 +83,14 @@ class Report(BaseModel):
     evidence: str
     userQuote: str
     elementContext: str
+    createdAt: str
+
+
+class Report(ReportSummary):
     conversationLog: list[ChatMessage]
     eventTimeline: list[TimelineEvent]
-    createdAt: str
+
+
+class ReportPage(BaseModel):
+    reports: list[ReportSummary]
+    nextCursor: str | None = None
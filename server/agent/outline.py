@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import ast
+import re
+from dataclasses import dataclass
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+
+# Top-level (unindented) declarations in TS/JS files
+_TS_DECL_RE = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:async\s+)?(?:abstract\s+)?"
+    r"(?P<keyword>function\*?|class|const|let|var|interface|type|enum)\s+(?P<name>[A-Za-z_$][\w$]*)"
+)
+_ROUTE_DECORATOR_RE = re.compile(r"^\w+\.(get|post|put|patch|delete|head|options)$")
+# A line ending in one of these continues the declaration on the next line
+_TS_CONTINUATION = ("=", "=>", "(", ",", "|", "&", "+", "?", ":", "<")
+
+
+@dataclass(frozen=True)
+class Symbol:
+    name: str
+    kind: str  # function | component | class | method | type | const | route
+    start: int  # 1-based, inclusive
+    end: int
+    route: str = ""  # "GET /api/orders/[id]/status" for route handlers
+
+    def describe(self) -> str:
+        label = f"{self.kind} {self.name}: lines {self.start}-{self.end}"
+        return f"{label} ({self.route})" if self.route else label
+
+
+def _next_route(path: str) -> str:
+    """URL of a Next.js route handler file, e.g. app/api/orders/[id]/status/route.ts -> /api/orders/[id]/status."""
+    directory = path.rsplit("/", 1)[0] if "/" in path else ""
+    segments = [s for s in directory.split("/")[1:] if not (s.startswith("(") and s.endswith(")"))]
+    return "/" + "/".join(segments)
+
+
+def _brace_end(lines: list[str], start: int) -> int:
+    """Index of the line closing the declaration that begins at lines[start].
+
+    A rough scan — quotes, comments and brackets only — which is enough for
+    finding where a top-level declaration ends.
+    """
+    depth = 0
+    opened = False
+    quote = None
+    in_comment = False
+    for i in range(start, len(lines)):
+        line = lines[i]
+        j = 0
+        while j < len(line):
+            ch = line[j]
+            if in_comment:
+                if line.startswith("*/", j):
+                    in_comment = False
+                    j += 1
+            elif quote:
+                if ch == "\\":
+                    j += 1
+                elif ch == quote:
+                    quote = None
+            elif line.startswith("//", j):
+                break
+            elif line.startswith("/*", j):
+                in_comment = True
+                j += 1
+            elif ch in "'\"`":
+                quote = ch
+            elif ch in "{([":
+                depth += 1
+                opened = True
+            elif ch in "})]":
+                depth -= 1
+            elif ch == ";" and depth <= 0:
+                return i
+            j += 1
+        if quote in ("'", '"'):
+            quote = None  # an apostrophe in JSX text, not a string
+        if depth <= 0 and not quote and not in_comment:
+            if opened or not line.rstrip().endswith(_TS_CONTINUATION):
+                return i
+    return len(lines) - 1
+
+
+def _ts_outline(path: str, text: str) -> list[Symbol]:
+    lines = text.splitlines()
+    jsx = path.endswith((".tsx", ".jsx"))
+    is_route = path.startswith("app/") and path.rsplit("/", 1)[-1].startswith("route.")
+    found: list[tuple[int, str, str, str]] = []
+    for i, line in enumerate(lines):
+        match = _TS_DECL_RE.match(line)
+        if match is None:
+            continue
+        keyword, name = match.group("keyword"), match.group("name")
+        route = ""
+        if keyword in ("interface", "type", "enum"):
+            kind = "type"
+        elif keyword == "class":
+            kind = "class"
+        else:
+            callable_ = keyword.startswith("function") or "=>" in line or "function" in line[match.end():]
+            if is_route and name in HTTP_METHODS:
+                kind, route = "route", f"{name} {_next_route(path)}"
+            elif callable_:
+                kind = "component" if jsx and name[0].isupper() else "function"
+            else:
+                kind = "const"
+        found.append((i, name, kind, route))
+
+    symbols = []
+    for n, (i, name, kind, route) in enumerate(found):
+        end = _brace_end(lines, i)
+        if n + 1 < len(found):
+            end = min(end, found[n + 1][0] - 1)  # never run into the next declaration
+        symbols.append(Symbol(name, kind, i + 1, end + 1, route))
+    return symbols
+
+
+def _py_route(node: ast.FunctionDef | ast.AsyncFunctionDef) -> str:
+    for decorator in node.decorator_list:
+        if not (isinstance(decorator, ast.Call) and decorator.args):
+            continue
+        target = ast.unparse(decorator.func)
+        path = decorator.args[0]
+        if _ROUTE_DECORATOR_RE.match(target) and isinstance(path, ast.Constant) and isinstance(path.value, str):
+            return f"{target.rsplit('.', 1)[1].upper()} {path.value}"
+    return ""
+
+
+def _py_symbol(node: ast.stmt, name: str, kind: str) -> Symbol:
+    decorators = getattr(node, "decorator_list", [])
+    start = min([node.lineno, *(d.lineno for d in decorators)])
+    return Symbol(name, kind, start, node.end_lineno or node.lineno)
+
+
+def _py_outline(text: str) -> list[Symbol]:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    symbols = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            route = _py_route(node)
+            symbol = _py_symbol(node, node.name, "route" if route else "function")
+            symbols.append(Symbol(symbol.name, symbol.kind, symbol.start, symbol.end, route))
+        elif isinstance(node, ast.ClassDef):
+            symbols.append(_py_symbol(node, node.name, "class"))
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append(_py_symbol(item, f"{node.name}.{item.name}", "method"))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    symbols.append(_py_symbol(node, target.id, "const"))
+    return symbols
+
+
+def outline(path: str, text: str) -> list[Symbol]:
+    """Functions, components, classes, exports and routes in a source file, with their line spans."""
+    if path.endswith(".py"):
+        return _py_outline(text)
+    if path.endswith((".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")):
+        return _ts_outline(path, text)
+    return []
+
+
+def find_symbol(symbols: list[Symbol], name: str) -> Symbol | None:
+    """The symbol called ``name``: exact, then case-insensitive, then a method or route by its short name."""
+    wanted = name.strip()
+    for candidates in (
+        [s for s in symbols if s.name == wanted],
+        [s for s in symbols if s.name.lower() == wanted.lower()],
+        [s for s in symbols if s.name.rsplit(".", 1)[-1] == wanted or s.route == wanted],
+    ):
+        if candidates:
+            return candidates[0]
+    return None
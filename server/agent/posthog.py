@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+
+import httpx
+
+from agent.config import (
+    POSTHOG_CONNECT_TIMEOUT,
+    POSTHOG_HOST,
+    POSTHOG_HTTP2,
+    POSTHOG_KEEPALIVE_EXPIRY,
+    POSTHOG_MAX_CONNECTIONS,
+    POSTHOG_MAX_KEEPALIVE,
+    POSTHOG_PERSONAL_API_KEY,
+    POSTHOG_PROJECT_ID,
+    POSTHOG_READ_TIMEOUT,
+)
+
+logger = logging.getLogger("relay")
+
+# Size of the event window getUserEvents shows the agent
+EVENT_LIMIT = 20
+
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = POSTHOG_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("[posthog] POSTHOG_HTTP2 is set but h2 is not installed — using HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=POSTHOG_MAX_CONNECTIONS,
+            max_keepalive_connections=POSTHOG_MAX_KEEPALIVE,
+            keepalive_expiry=POSTHOG_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            POSTHOG_READ_TIMEOUT,
+            connect=POSTHOG_CONNECT_TIMEOUT,
+            read=POSTHOG_READ_TIMEOUT,
+        ),
+    )
+
+
+def open_client() -> None:
+    """Create the shared client. Called from the FastAPI lifespan on startup."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections. Called on shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared PostHog client, created on first use outside the app lifespan."""
+    if _client is None:
+        open_client()
+    return _client
+
+
+async def fetch_session_events(session_id: str, *, after: str | None = None) -> list[dict]:
+    """Raw PostHog events for a session, newest first.
+
+    With ``after``, only events newer than that timestamp are requested.
+    Raises httpx.HTTPError on transport failures and non-200 responses.
+    """
+    params = {"session_id": session_id, "limit": EVENT_LIMIT}
+    if after:
+        params["after"] = after
+    res = await get_client().get(
+        f"{POSTHOG_HOST}/api/projects/{POSTHOG_PROJECT_ID}/events",
+        params=params,
+        headers={"Authorization": f"Bearer {POSTHOG_PERSONAL_API_KEY}"},
+    )
+    res.raise_for_status()
+    return res.json().get("results", [])
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+from agent import metrics
+from agent.config import PREFETCH_MAX_SOURCE_FILES
+from agent.models import FDERequest
+
+logger = logging.getLogger("relay")
+
+# The investigation the system prompt starts every first turn with
+SEEDED_TOOLS = ("getUserEvents", "searchBusinessRules")
+MAX_RULES_QUERY_CHARS = 200
+
+
+def _key(name: str, arguments: dict) -> str:
+    return name + json.dumps(arguments, sort_keys=True)
+
+
+def _rules_query(req: FDERequest) -> str:
+    """What the user ran into, in words the business rules search can match."""
+    parts = []
+    if req.errorMessage:
+        parts.append(req.errorMessage)
+    if req.elementContext:
+        parts.extend([req.elementContext.elementName, req.elementContext.visibleText])
+    if not parts and req.messages:
+        parts.append(req.messages[-1].content)
+    return " ".join(p for p in parts if p).strip()[:MAX_RULES_QUERY_CHARS]
+
+
+def speculative_calls(req: FDERequest, *, first_turn: bool) -> list[tuple[str, dict]]:
+    """Tool calls the model is all but certain to make for this request.
+
+    The business rules query is a guess the model wouldn't phrase the same
+    way, so it is only worth running on a first turn, where its result is
+    seeded into the conversation (see Prefetch.seeds).
+    """
+    calls: list[tuple[str, dict]] = []
+    if req.sessionId:
+        calls.append(("getUserEvents", {"sessionId": req.sessionId}))
+    query = _rules_query(req)
+    if first_turn and query:
+        calls.append(("searchBusinessRules", {"query": query}))
+    for path in list(dict.fromkeys(req.codebaseSnapshotPaths))[:PREFETCH_MAX_SOURCE_FILES]:
+        calls.append(("readSourceFile", {"filePath": path}))
+    return calls
+
+
+class Prefetch:
+    """Speculative tool calls, started when a request arrives.
+
+    On a first turn the SEEDED_TOOLS results are put into the conversation
+    before the first model call, as though the model had asked for them —
+    which is what the system prompt has it do anyway, one round trip later.
+    The other results answer a later tool call with the same name and
+    arguments. close() cancels whatever was never used.
+    """
+
+    def __init__(self, calls: list[tuple[str, dict]], tasks: list[asyncio.Task], *, first_turn: bool) -> None:
+        self.first_turn = first_turn
+        self._pending: dict[str, tuple[str, dict, asyncio.Task]] = {
+            _key(name, arguments): (name, arguments, task) for (name, arguments), task in zip(calls, tasks)
+        }
+
+    def seeds(self) -> list[tuple[str, dict, asyncio.Task]]:
+        """Calls to seed into the conversation now, removed from the pending set."""
+        if not self.first_turn:
+            return []
+        seeded = []
+        for key, (name, arguments, task) in list(self._pending.items()):
+            if name in SEEDED_TOOLS:
+                del self._pending[key]
+                metrics.prefetch_total.inc(tool=name, outcome="seeded")
+                seeded.append((name, arguments, task))
+        return seeded
+
+    def take(self, name: str, arguments: dict) -> asyncio.Task | None:
+        """The speculative task for this exact call, if there is one."""
+        found = self._pending.pop(_key(name, arguments), None)
+        if found is None:
+            return None
+        metrics.prefetch_total.inc(tool=name, outcome="answered")
+        return found[2]
+
+    def close(self) -> None:
+        for name, _arguments, task in self._pending.values():
+            task.cancel()
+            metrics.prefetch_total.inc(tool=name, outcome="unused")
+        if self._pending:
+            logger.info("[prefetch] Dropped %d unused call(s)", len(self._pending))
+        self._pending.clear()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from collections.abc import AsyncIterator
+from functools import cache
+from types import SimpleNamespace
+from typing import Protocol
+
+from agent.config import MODEL_PROVIDER, OPENAI_API_KEY, STUB_SCRIPT_PATH, STUB_TOKENS_PER_SECOND
+
+
+class ModelProvider(Protocol):
+    """Streams chat completion chunks shaped like OpenAI's ChatCompletionChunk."""
+
+    async def stream(self, *, model: str, messages: list[dict], tools: list[dict]) -> AsyncIterator: ...
+
+
+class OpenAIProvider:
+    def __init__(self, api_key: str) -> None:
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key)
+
+    async def stream(self, *, model: str, messages: list[dict], tools: list[dict]) -> AsyncIterator:
+        return await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=tools,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+
+# -- Offline stub --------------------------------------------------------------
+
+# The investigation the system prompt asks for: events, rules and a code search, then source, then an answer
+DEFAULT_STUB_SCRIPT: list[dict] = [
+    {
+        "tool_calls": [
+            {"name": "getUserEvents", "arguments": {"sessionId": "current"}},
+            {"name": "searchBusinessRules", "arguments": {"query": "transition"}},
+            {"name": "searchCode", "arguments": {"query": "ERR_INVALID_TRANSITION"}},
+        ],
+    },
+    {
+        "tool_calls": [
+            {"name": "readSourceFile", "arguments": {"filePath": "app/api/orders/[id]/status/route.ts"}},
+        ],
+    },
+    {
+        "text": (
+            "Sorry about that — I can see the status update was rejected. Orders have to move from "
+            "pending to processing before they can be shipped, so the Request Shipping button asks for "
+            "a change the system doesn't allow yet. Set the order to Processing first, then ship it. "
+            "I've let the engineering team know the button shouldn't appear on pending orders."
+        ),
+    },
+]
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _chunk(*, content: str | None = None, tool_calls: list | None = None, finish_reason: str | None = None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+def _tool_call(index: int, *, id: str | None = None, name: str | None = None, arguments: str | None = None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class StubProvider:
+    """Deterministic local provider that streams a scripted investigation.
+
+    The step is chosen from how many tool-calling assistant turns follow the
+    last user message, so every session walks the same script. Text and tool
+    arguments are emitted word by word at ``tokens_per_second``. Chunks are
+    plain namespaces rather than OpenAI models so the stub itself adds almost
+    no CPU to what a benchmark measures.
+    """
+
+    def __init__(self, script: list[dict], tokens_per_second: float) -> None:
+        self.script = script
+        self.delay = 1 / tokens_per_second if tokens_per_second > 0 else 0
+
+    def _step(self, messages: list[dict]) -> int:
+        step = 0
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                break
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                step += 1
+        return min(step, len(self.script) - 1)
+
+    async def stream(self, *, model: str, messages: list[dict], tools: list[dict]) -> AsyncIterator:
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in messages)
+        return self._emit(self._step(messages), prompt_tokens=prompt_chars // 4)
+
+    async def _emit(self, step_index: int, *, prompt_tokens: int) -> AsyncIterator:
+        step = self.script[step_index]
+        completion_tokens = 0
+        for token in _TOKEN_RE.findall(step.get("text", "")):
+            await asyncio.sleep(self.delay)
+            completion_tokens += 1
+            yield _chunk(content=token)
+
+        calls = step.get("tool_calls", [])
+        for index, call in enumerate(calls):
+            await asyncio.sleep(self.delay)
+            yield _chunk(tool_calls=[_tool_call(index, id=f"call_stub_{step_index}_{index}", name=call["name"], arguments="")])
+            for fragment in _TOKEN_RE.findall(json.dumps(call.get("arguments", {}))):
+                await asyncio.sleep(self.delay)
+                completion_tokens += 1
+                yield _chunk(tool_calls=[_tool_call(index, arguments=fragment)])
+
+        yield _chunk(finish_reason="tool_calls" if calls else "stop")
+        # Trailing usage-only chunk, as OpenAI sends with stream_options.include_usage
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+@cache
+def get_provider() -> ModelProvider:
+    """The configured provider, created on first use (so the stub never needs an API key)."""
+    if MODEL_PROVIDER == "stub":
+        script = DEFAULT_STUB_SCRIPT
+        if STUB_SCRIPT_PATH:
+            with open(STUB_SCRIPT_PATH, "r", encoding="utf-8") as f:
+                script = json.load(f)
+        return StubProvider(script, STUB_TOKENS_PER_SECOND)
+    return OpenAIProvider(OPENAI_API_KEY)
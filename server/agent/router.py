@@ -1,16 +1,27 @@
 import logging
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 
+from agent.admission import AdmissionRejected, admission, client_key
+from agent.diagnosis import diagnosis_cache
 from agent.loop import run_fde_stream
-from agent.models import FDERequest
-from agent.store import get_reports
+from agent.models import FDERequest, Report, ReportPage
+from agent.runs import run_registry
+from agent.transcripts import TranscriptConflict, transcript_store
+from agent.store import get_report, list_report_summaries, reports_etag
 
 logger = logging.getLogger("relay")
 
 router = APIRouter(prefix="/api/fde")
 
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+    "x-vercel-ai-ui-message-stream": "v1",
+}
+
 
 @router.post("/stream")
 async def fde_stream(request: Request, req: FDERequest):
@@ -22,19 +33,93 @@ async def fde_stream(request: Request, req: FDERequest):
         len(req.recentEvents),
         len(req.pageSnapshot),
     )
-    return StreamingResponse(
-        run_fde_stream(req),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-            "x-vercel-ai-ui-message-stream": "v1",
-        },
-    )
+    turn = req
+    try:
+        req = transcript_store.expand(turn)
+    except TranscriptConflict:
+        raise HTTPException(status_code=409, detail="Transcript out of sync; resend the full message history")
+
+    start = run_fde_stream
+    on_answer = None
+    if req.conversationId:
+        conversation_id = req.conversationId
+        on_answer = lambda text: transcript_store.record_answer(conversation_id, text)
+        start = lambda r: run_fde_stream(r, on_answer)
+    if diagnosis_cache.reuses(req):
+        frames = diagnosis_cache.stream(req, start, on_answer)  # a replay costs no agent slot
+    else:
+        try:
+            ticket = admission.reserve(client_key(req))
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many concurrent chats ({e.reason}); retry shortly.",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        try:
+            # From here the run owns the ticket (admission.run releases it when the run
+            # ends, and an unwatched run is cancelled — see AgentRun); until then we do
+            frames = diagnosis_cache.stream(req, lambda r: admission.run(ticket, start, r))
+        except BaseException:
+            admission.release(ticket)
+            raise
+    transcript_store.commit(turn, req)
+    return StreamingResponse(frames, media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@router.get("/stream/{message_id}")
+async def fde_stream_resume(
+    request: Request,
+    message_id: str,
+    lastEventId: int | None = Query(None, ge=0),
+):
+    """Replay the frames after Last-Event-ID, then follow the run live if it is still going.
+
+    The messageId comes from the stream's "start" frame. Resuming never
+    re-runs the agent.
+    """
+    header = request.headers.get("last-event-id", "")
+    after = int(header) if header.isdigit() else (lastEventId or 0)
+    logger.info("[stream] GET /api/fde/stream/%s — resuming after event %d", message_id, after)
+
+    run = run_registry.resume(message_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No resumable stream for {message_id}")
+    if not run.can_resume(after):
+        raise HTTPException(status_code=410, detail="Those frames are no longer buffered; start a new chat turn")
+    return StreamingResponse(diagnosis_cache.resume(run, after), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@router.get("/reports", response_model=ReportPage)
+async def list_reports(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    type: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+):
+    """Newest-first report summaries; fetch /reports/{id} for the conversation and timeline."""
+    logger.info("[reports] GET /api/fde/reports — limit=%d, cursor=%s, type=%s", limit, bool(cursor), type)
+    etag = await reports_etag(limit, cursor, type, since, until)
+    # no-cache makes browsers revalidate each poll, which is answered with a bodiless 304
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        page = await list_report_summaries(limit=limit, cursor=cursor, type=type, since=since, until=until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers.update(headers)
+    return page
 
 
-@router.get("/reports")
-async def list_reports():
-    logger.info("[reports] GET /api/fde/reports")
-    return get_reports()
+@router.get("/reports/{report_id}", response_model=Report)
+async def report_detail(report_id: str):
+    logger.info("[reports] GET /api/fde/reports/%s", report_id)
+    report = await get_report(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Report not found: {report_id}")
+    return report
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+_SECTION_RE = re.compile(r"(?=^## )", flags=re.MULTILINE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Shortest query token that also matches longer indexed terms ("transit" -> "transition")
+MIN_PREFIX_CHARS = 3
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with a naive plural strip, so "transitions" finds "transition"."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# Query words that say nothing about which rule applies; prefetch queries are free text
+STOPWORDS = frozenset(tokenize(
+    "a an and are as at be but by can could did do does for from had has have how i if in into is it its "
+    "me my no not of on or our should so than that the their then there this to was we were what when "
+    "where which who why will with would you your"
+))
+
+
+class RulesIndex:
+    """Inverted index over the ``## `` sections of BUSINESS_RULES.md.
+
+    Built lazily on first search and rebuilt only when the resolved rules file
+    or its mtime changes, or after invalidate() (called on codebase upload).
+    """
+
+    def __init__(self) -> None:
+        self._key: tuple[str, int] | None = None
+        self._sections: list[str] = []
+        self._headings: list[str] = []
+        self._lengths: list[int] = []
+        self._avg_length = 0.0
+        self._postings: dict[str, dict[int, int]] = {}  # term -> {section index: term frequency}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._key = None
+
+    def _ensure(self, path: str) -> None:
+        mtime_ns = os.stat(path).st_mtime_ns
+        if self._key == (path, mtime_ns):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        sections = [s.strip() for s in _SECTION_RE.split(content) if s.strip()]
+        postings: dict[str, dict[int, int]] = defaultdict(dict)
+        lengths = []
+        for i, section in enumerate(sections):
+            heading = section.splitlines()[0]
+            # Count heading terms twice so a section's title outranks passing mentions
+            tokens = tokenize(section) + tokenize(heading)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term][i] = tf
+
+        self._sections = sections
+        self._headings = [s.splitlines()[0].lstrip("# ").strip() for s in sections]
+        self._lengths = lengths
+        self._avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        self._postings = dict(postings)
+        self._key = (path, mtime_ns)
+
+    def _expand(self, term: str, query_terms: set[str]) -> list[str]:
+        """Exact term if indexed, otherwise the indexed terms it is a prefix of.
+
+        Only tokens of MIN_PREFIX_CHARS or more expand, and never into a term
+        the query already contains, which scores on its own.
+        """
+        if term in self._postings:
+            return [term]
+        if len(term) < MIN_PREFIX_CHARS:
+            return []
+        return [t for t in self._postings if t.startswith(term) and t not in query_terms]
+
+    def search(self, path: str, query: str, top_k: int) -> list[str]:
+        """Return up to top_k sections ranked by BM25. Raises FileNotFoundError."""
+        with self._lock:
+            self._ensure(path)
+            n = len(self._sections)
+            scores: dict[int, float] = defaultdict(float)
+            terms = set(tokenize(query)) - STOPWORDS
+            for term in terms:
+                for indexed in self._expand(term, terms):
+                    docs = self._postings[indexed]
+                    idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for i, tf in docs.items():
+                        norm = K1 * (1 - B + B * self._lengths[i] / self._avg_length)
+                        scores[i] += idf * tf * (K1 + 1) / (tf + norm)
+
+            ranked = sorted(scores, key=lambda i: (-scores[i], i))[:top_k]
+            return [self._sections[i] for i in ranked]
+
+    def headings(self, path: str) -> list[str]:
+        with self._lock:
+            self._ensure(path)
+            return list(self._headings)
+
+
+rules_index = RulesIndex()
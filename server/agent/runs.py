@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+
+from agent.config import (
+    REPLAY_BUFFER_MAX_BYTES,
+    REPLAY_MAX_RUNS,
+    REPLAY_MAX_TOTAL_BYTES,
+    REPLAY_TTL_SECONDS,
+    RESUME_GRACE_SECONDS,
+)
+
+logger = logging.getLogger("relay")
+
+_START_PREFIX = 'data: {"type": "start", "messageId": '
+_ERROR_PREFIX = 'data: {"type": "error"'
+# Sent without an id, so the client's Last-Event-ID still points at what it has
+_FELL_BEHIND = 'data: {"type": "error", "error": "The stream fell too far behind to continue; start a new chat turn"}\n\n'
+
+
+class AgentRun:
+    """One agent run whose SSE frames are numbered, recorded and fanned out to subscribers.
+
+    Each frame gets a sequential SSE ``id:`` so a client that drops can resume
+    from its Last-Event-ID. The run is driven by a task of its own, so it
+    outlives any one connection; once the last subscriber has been gone for
+    ``grace`` seconds — or if none has arrived ``grace`` seconds after the
+    start, e.g. because the response never began — it is cancelled. The recording keeps at most ``max_bytes``,
+    dropping the oldest frames first.
+    """
+
+    def __init__(self, max_bytes: int, grace: float) -> None:
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.message_id: str | None = None
+        self.frames: list[str] = []
+        self.first_id = 1  # event id of frames[0]
+        self.size = 0
+        self.done = False
+        self.failed = False
+        self.finished_at = 0.0
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._cancel_timer: asyncio.TimerHandle | None = None
+
+    @property
+    def last_id(self) -> int:
+        return self.first_id + len(self.frames) - 1
+
+    @property
+    def complete(self) -> bool:
+        """Whether every frame since the start is still recorded."""
+        return self.first_id == 1
+
+    def start(self, frames: AsyncIterator[str], on_message_id) -> None:
+        self._task = asyncio.create_task(self._drive(frames, on_message_id))
+        self._arm_cancel_timer()
+
+    async def _drive(self, frames: AsyncIterator[str], on_message_id) -> None:
+        try:
+            async for frame in frames:
+                if self.message_id is None and frame.startswith(_START_PREFIX):
+                    self.message_id = json.loads(frame[6:])["messageId"]
+                    on_message_id(self)
+                elif frame.startswith(_ERROR_PREFIX):
+                    self.failed = True
+                self._append(f"id: {self.last_id + 1}\n{frame}")
+                async with self._changed:
+                    self._changed.notify_all()
+        except Exception as e:
+            logger.error("[runs] Agent run failed: %s", e, exc_info=True)
+            self.failed = True
+        finally:
+            self.done = True
+            self.finished_at = time.monotonic()
+            async with self._changed:
+                self._changed.notify_all()
+
+    def _append(self, frame: str) -> None:
+        self.frames.append(frame)
+        self.size += len(frame)
+        if self.size > self.max_bytes:
+            drop = 0
+            while self.size > self.max_bytes and drop < len(self.frames) - 1:
+                self.size -= len(self.frames[drop])
+                drop += 1
+            del self.frames[:drop]
+            self.first_id += drop
+
+    def can_resume(self, after: int) -> bool:
+        return self.first_id - 1 <= after <= self.last_id
+
+    def cancel(self) -> None:
+        if self._task is not None and not self.done:
+            self.failed = True  # a partial answer is never replayed
+            self._task.cancel()
+
+    def _arm_cancel_timer(self) -> None:
+        if not self.subscribers and not self.done and self._cancel_timer is None:
+            self._cancel_timer = asyncio.get_running_loop().call_later(self.grace, self._cancel_if_unwatched)
+
+    def _cancel_if_unwatched(self) -> None:
+        self._cancel_timer = None
+        if not self.subscribers and not self.done:
+            logger.info("[runs] No subscribers for %.0fs — cancelling messageId=%s", self.grace, self.message_id)
+            self.cancel()
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[str]:
+        """Frames with ids after ``after`` — recorded ones first, then live ones until the run ends."""
+        next_id = after + 1
+        self.subscribers += 1
+        if self._cancel_timer is not None:
+            self._cancel_timer.cancel()
+            self._cancel_timer = None
+        try:
+            while True:
+                if next_id < self.first_id:
+                    logger.warning("[runs] Subscriber fell behind the replay buffer for messageId=%s", self.message_id)
+                    yield _FELL_BEHIND
+                    return
+                if next_id <= self.last_id:
+                    frame = self.frames[next_id - self.first_id]
+                    next_id += 1
+                    yield frame
+                    continue
+                if self.done:
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: next_id <= self.last_id or self.done)
+        finally:
+            self.subscribers -= 1
+            self._arm_cancel_timer()
+
+
+class RunRegistry:
+    """Agent runs by messageId, kept for ``ttl`` seconds after they finish so clients can resume.
+
+    Finished runs are also dropped, oldest first, once their recordings add up
+    to more than ``max_total_bytes``. Expired runs are swept on every start,
+    resume and stats call.
+    """
+
+    def __init__(self, ttl: float, max_runs: int, max_bytes: int, grace: float, max_total_bytes: int) -> None:
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.max_total_bytes = max_total_bytes
+        self.resumes = 0
+        self._runs: OrderedDict[str, AgentRun] = OrderedDict()
+
+    def _expired(self, run: AgentRun) -> bool:
+        return run.done and time.monotonic() - run.finished_at > self.ttl
+
+    def _sweep(self) -> None:
+        for message_id in [m for m, run in self._runs.items() if self._expired(run)]:
+            del self._runs[message_id]
+        finished = sum(run.size for run in self._runs.values() if run.done)
+        if finished > self.max_total_bytes:
+            for message_id, run in list(self._runs.items()):
+                if run.done:
+                    del self._runs[message_id]
+                    finished -= run.size
+                    if finished <= self.max_total_bytes:
+                        break
+
+    def start(self, frames: AsyncIterator[str]) -> AgentRun:
+        self._sweep()
+        run = AgentRun(self.max_bytes, self.grace)
+        run.start(frames, self._register)
+        return run
+
+    def _register(self, run: AgentRun) -> None:
+        self._runs[run.message_id] = run
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+
+    def resume(self, message_id: str) -> AgentRun | None:
+        """The run to reattach to, or None if unknown or expired."""
+        self._sweep()
+        run = self._runs.get(message_id)
+        if run is None:
+            return None
+        self.resumes += 1
+        return run
+
+    def stats(self) -> dict:
+        self._sweep()
+        active = sum(1 for run in self._runs.values() if not run.done)
+        return {
+            "runs": len(self._runs),
+            "active": active,
+            "bytes": sum(run.size for run in self._runs.values()),
+            "resumes": self.resumes,
+        }
+
+
+run_registry = RunRegistry(
+    REPLAY_TTL_SECONDS, REPLAY_MAX_RUNS, REPLAY_BUFFER_MAX_BYTES, RESUME_GRACE_SECONDS, REPLAY_MAX_TOTAL_BYTES
+)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from agent.config import SOURCE_CACHE_MAX_BYTES, SOURCE_CACHE_MAX_ENTRIES
+
+
+@dataclass
+class _Entry:
+    absolute: str  # file the request path resolved to (uploaded codebase or PROJECT_ROOT)
+    mtime_ns: int
+    content: str  # the whole decoded file; readSourceFile picks the part it returns
+    size: int  # bytes the content takes in memory
+
+
+class SourceCache:
+    """Process-wide LRU of readSourceFile results, keyed by the normalized request path.
+
+    An entry is served only while the file's mtime is unchanged; the codebase
+    upload endpoint also invalidates the paths it writes. The least recently
+    used entries go once there are more than ``max_entries`` or they take more
+    than ``max_bytes``; a file bigger than that on its own is not cached.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None:
+            try:
+                fresh = os.stat(entry.absolute).st_mtime_ns == entry.mtime_ns
+            except OSError:
+                fresh = False
+            with self._lock:
+                if fresh:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry.content
+                if self._entries.get(path) is entry:
+                    self._drop(path)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _drop(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def put(self, path: str, absolute: str, mtime_ns: int, content: str) -> None:
+        size = sys.getsizeof(content)
+        with self._lock:
+            self._drop(path)
+            if size > self.max_bytes:
+                return
+            self._entries[path] = _Entry(absolute, mtime_ns, content, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, path: str | None = None) -> None:
+        """Drop one request path, or everything when path is None."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.size = 0
+            else:
+                self._drop(path.lstrip("/"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "bytes": self.size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+source_cache = SourceCache(SOURCE_CACHE_MAX_ENTRIES, SOURCE_CACHE_MAX_BYTES)
@@ -1,15 +1,164 @@
 from __future__ import annotations
 
-import math
-import random
+import asyncio
+import base64
+import hashlib
+import json
+import uuid
+import zlib
 from datetime import datetime, timezone
 
-from agent.models import ChatMessage, Report, TimelineEvent
+from sqlalchemy import ForeignKey, LargeBinary, String, Text, and_, func, or_, select
+from sqlalchemy.orm import Mapped, mapped_column
 
-_reports: list[Report] = []
+from agent.models import ChatMessage, Report, ReportPage, ReportSummary, TimelineEvent
+from database import Base, SessionLocal
 
 
-def add_report(
+class ReportRow(Base):
+    __tablename__ = "reports"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    type: Mapped[str] = mapped_column(String, index=True)
+    title: Mapped[str] = mapped_column(Text)
+    summary: Mapped[str] = mapped_column(Text)
+    evidence: Mapped[str] = mapped_column(Text)
+    user_quote: Mapped[str] = mapped_column(Text)
+    element_context: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[str] = mapped_column(String, index=True)  # ISO 8601, UTC
+
+
+class ReportPayloadRow(Base):
+    """Heavy per-report fields, kept out of the reports table and zlib-compressed."""
+
+    __tablename__ = "report_payloads"
+
+    report_id: Mapped[str] = mapped_column(ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True)
+    conversation_log: Mapped[bytes] = mapped_column(LargeBinary)
+    event_timeline: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+def _pack(items: list) -> bytes:
+    return zlib.compress(json.dumps([i.model_dump() for i in items]).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> list[dict]:
+    return json.loads(zlib.decompress(blob))
+
+
+def _to_summary(row: ReportRow) -> ReportSummary:
+    return ReportSummary(
+        id=row.id,
+        type=row.type,
+        title=row.title,
+        summary=row.summary,
+        evidence=row.evidence,
+        userQuote=row.user_quote,
+        elementContext=row.element_context,
+        createdAt=row.created_at,
+    )
+
+
+def _to_report(row: ReportRow, payload: ReportPayloadRow | None) -> Report:
+    return Report(
+        **_to_summary(row).model_dump(),
+        conversationLog=_unpack(payload.conversation_log) if payload else [],
+        eventTimeline=_unpack(payload.event_timeline) if payload else [],
+    )
+
+
+def encode_cursor(created_at: str, report_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{report_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        created_at, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return created_at, report_id
+
+
+def _utc_iso(value: str) -> str:
+    """Normalize a client timestamp to the stored UTC isoformat so string comparison holds."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _insert_report(report: Report) -> None:
+    with SessionLocal() as db:
+        db.add(ReportRow(
+            id=report.id,
+            type=report.type,
+            title=report.title,
+            summary=report.summary,
+            evidence=report.evidence,
+            user_quote=report.userQuote,
+            element_context=report.elementContext,
+            created_at=report.createdAt,
+        ))
+        db.flush()  # parent row first, for the payload's foreign key
+        db.add(ReportPayloadRow(
+            report_id=report.id,
+            conversation_log=_pack(report.conversationLog),
+            event_timeline=_pack(report.eventTimeline),
+        ))
+        db.commit()
+
+
+def _select_summaries(
+    limit: int,
+    cursor: tuple[str, str] | None,
+    type: str | None,
+    since: str | None,
+    until: str | None,
+) -> ReportPage:
+    query = select(ReportRow).order_by(ReportRow.created_at.desc(), ReportRow.id.desc())
+    if cursor:
+        created_at, report_id = cursor
+        query = query.where(or_(
+            ReportRow.created_at < created_at,
+            and_(ReportRow.created_at == created_at, ReportRow.id < report_id),
+        ))
+    if type:
+        query = query.where(ReportRow.type == type)
+    if since:
+        query = query.where(ReportRow.created_at >= since)
+    if until:
+        query = query.where(ReportRow.created_at < until)
+
+    with SessionLocal() as db:
+        # One extra row tells us whether there is a next page
+        rows = db.scalars(query.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return ReportPage(reports=[_to_summary(r) for r in rows], nextCursor=next_cursor)
+
+
+def _select_report(report_id: str) -> Report | None:
+    with SessionLocal() as db:
+        found = db.execute(
+            select(ReportRow, ReportPayloadRow)
+            .outerjoin(ReportPayloadRow, ReportPayloadRow.report_id == ReportRow.id)
+            .where(ReportRow.id == report_id)
+        ).first()
+        return _to_report(*found) if found else None
+
+
+def _select_version() -> str:
+    # Reports are append-only, so row count plus newest timestamp identifies the table state
+    with SessionLocal() as db:
+        count, newest = db.execute(select(func.count(ReportRow.id), func.max(ReportRow.created_at))).one()
+    return f"{count}:{newest or ''}"
+
+
+async def add_report(
     *,
     type: str,
     title: str,
@@ -21,7 +170,8 @@ def add_report(
     event_timeline: list[TimelineEvent] | None = None,
 ) -> Report:
     report = Report(
-        id=f"RPT-{math.floor(random.random() * 900000) + 100000}",
+        # uuid4 rather than a random 6-digit number — IDs are primary keys now
+        id=f"RPT-{uuid.uuid4().hex}",
         type=type,
         title=title,
         summary=summary,
@@ -32,9 +182,35 @@ def add_report(
         eventTimeline=event_timeline or [],
         createdAt=datetime.now(timezone.utc).isoformat(),
     )
-    _reports.append(report)
+    # SQLite calls block, so keep them off the event loop
+    await asyncio.to_thread(_insert_report, report)
     return report
 
 
-def get_reports() -> list[Report]:
-    return list(reversed(_reports))
+async def list_report_summaries(
+    *,
+    limit: int,
+    cursor: str | None = None,
+    type: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> ReportPage:
+    """Newest-first page of reports without conversationLog / eventTimeline.
+
+    Raises ValueError for a malformed cursor or timestamp.
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    since = _utc_iso(since) if since else None
+    until = _utc_iso(until) if until else None
+    return await asyncio.to_thread(_select_summaries, limit, decoded, type, since, until)
+
+
+async def get_report(report_id: str) -> Report | None:
+    return await asyncio.to_thread(_select_report, report_id)
+
+
+async def reports_etag(*parts: object) -> str:
+    """Weak ETag for a report listing — changes when any report is added."""
+    version = await asyncio.to_thread(_select_version)
+    digest = hashlib.sha1(repr((version, parts)).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
@@ -1,14 +1,27 @@
 from __future__ import annotations
 
 import os
+import re
+from pathlib import Path
 
-import httpx
+from agent.config import (
+    CODE_SEARCH_MAX_HITS,
+    POSTHOG_PERSONAL_API_KEY,
+    POSTHOG_PROJECT_ID,
+    PROJECT_ROOT,
+    RULES_SEARCH_TOP_K,
+)
 
-from agent.config import POSTHOG_HOST, POSTHOG_PERSONAL_API_KEY, POSTHOG_PROJECT_ID, PROJECT_ROOT
-
-# Uploaded codebase lives under data/{project}/frontend/
+# Uploaded codebase lives under data/{project}/frontend/ (server/ files under data/{project}/backend/)
 CODEBASE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "relay-engine", "frontend")
+BACKEND_CODEBASE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "relay-engine", "backend")
+from agent.code_index import code_index
+from agent.event_cache import event_cache
+from agent.io_pool import run_io
 from agent.models import ChatMessage
+from agent.outline import Symbol, find_symbol
+from agent.rules_index import rules_index
+from agent.source_cache import source_cache
 from agent.store import add_report
 
 # -- Mock data (fallback when PostHog is not configured) ---------------------
@@ -58,7 +71,9 @@ TOOL_DEFINITIONS = [
                 "Read a source file from the project. "
                 "Restricted to app/, components/, lib/, docs/, and server/ directories. "
                 "Use this to inspect API routes (app/api/), server actions, "
-                "and backend logic (server/) to diagnose issues."
+                "and backend logic (server/) to diagnose issues. Long files are cut off and come "
+                "with an outline of their functions, components and routes; pass symbol or "
+                "startLine/endLine to read just the part you need."
             ),
             "parameters": {
                 "type": "object",
@@ -67,11 +82,52 @@ TOOL_DEFINITIONS = [
                         "type": "string",
                         "description": 'The file path relative to the project root, e.g. "app/api/orders/[id]/status/route.ts"',
                     },
+                    "symbol": {
+                        "type": "string",
+                        "description": 'Read only this function, component, class or route handler, e.g. "ChatPanel" or "POST".',
+                    },
+                    "startLine": {
+                        "type": "integer",
+                        "description": "First line to read (1-based). Ignored when symbol is given.",
+                    },
+                    "endLine": {
+                        "type": "integer",
+                        "description": "Last line to read (inclusive). Ignored when symbol is given.",
+                    },
                 },
                 "required": ["filePath"],
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "searchCode",
+            "description": (
+                "Search the project's source code for a string or regular expression and get "
+                "matching lines with their file paths and line numbers. Use this to find where an "
+                "error message, error code, function or route is defined before reading files."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": 'Text to find, e.g. "Invalid status transition" or "ERR_INVALID_TRANSITION". Case-insensitive.',
+                    },
+                    "regex": {
+                        "type": "boolean",
+                        "description": "Treat the query as a regular expression, e.g. \"status.*(shipped|delivered)\". Defaults to false.",
+                    },
+                    "maxResults": {
+                        "type": "integer",
+                        "description": f"Maximum number of matching lines to return (at most {CODE_SEARCH_MAX_HITS}).",
+                    },
+                },
+                "required": ["query"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -143,19 +199,9 @@ async def getUserEvents(sessionId: str) -> dict:
         return {"events": MOCK_TIMELINE_EVENTS}
 
     try:
-        url = (
-            f"{POSTHOG_HOST}/api/projects/{POSTHOG_PROJECT_ID}"
-            f"/events?session_id={sessionId}&limit=20"
-        )
-        async with httpx.AsyncClient(timeout=10) as client:
-            res = await client.get(url, headers={"Authorization": f"Bearer {POSTHOG_PERSONAL_API_KEY}"})
-
-        if res.status_code != 200:
-            return {"events": MOCK_TIMELINE_EVENTS}
-
-        data = res.json()
+        results = await event_cache.get(sessionId)
         events = []
-        for i, e in enumerate(data.get("results", [])):
+        for i, e in enumerate(results):
             props = e.get("properties", {})
             events.append({
                 "id": f"evt-{i}",
@@ -170,53 +216,169 @@ async def getUserEvents(sessionId: str) -> dict:
         return {"events": MOCK_TIMELINE_EVENTS}
 
 
-async def readSourceFile(filePath: str) -> dict:
-    normalized = filePath.lstrip("/")
-
-    if not any(normalized.startswith(prefix) for prefix in ALLOWED_PREFIXES):
-        return {"content": f"Access denied: only files in {', '.join(ALLOWED_PREFIXES)} are readable."}
+def _load_source(normalized: str) -> str | None:
+    cached = source_cache.get(normalized)
+    if cached is not None:
+        return cached
 
-    # Try uploaded codebase first, then fall back to PROJECT_ROOT
-    codebase_abs = os.path.abspath(CODEBASE_DIR)
-    for base_dir in [codebase_abs, PROJECT_ROOT]:
-        absolute = os.path.normpath(os.path.join(base_dir, normalized))
-        if not absolute.startswith(base_dir):
+    # The roots searchCode reports paths against ("server/..." is the uploaded
+    # backend), then PROJECT_ROOT for anything else in the repo
+    candidates = []
+    for directory, prefix in _code_roots():
+        if normalized.startswith(prefix):
+            candidates.append((str(directory), normalized[len(prefix):]))
+    candidates.sort(key=lambda c: len(c[1]))  # a prefixed root before the unprefixed one
+    candidates.append((PROJECT_ROOT, normalized))
+    for base_dir, relative in candidates:
+        absolute = os.path.normpath(os.path.join(base_dir, relative))
+        if not absolute.startswith(os.path.join(base_dir, "")):
             continue
         try:
+            # Stat before reading so a write racing the read leaves a stale mtime
+            mtime_ns = os.stat(absolute).st_mtime_ns
             with open(absolute, "r", encoding="utf-8") as f:
                 content = f.read()
-            if len(content) > MAX_FILE_CHARS:
-                content = content[:MAX_FILE_CHARS] + "\n\n... (truncated at 5000 chars)"
-            return {"content": content}
+            source_cache.put(normalized, absolute, mtime_ns, content)
+            return content
         except FileNotFoundError:
             continue
+    return None
 
-    return {"content": f"File not found: {filePath}"}
 
+def _outline(normalized: str, content: str) -> list[Symbol]:
+    # Blocks while the code index is being built
+    return code_index.outline(_code_roots(), normalized, content)
 
-async def searchBusinessRules(query: str) -> dict:
+
+def _excerpt(lines: list[str], start: int, end: int) -> dict:
+    content = "\n".join(lines[start - 1:end])
+    if len(content) > MAX_FILE_CHARS:
+        cut = content.rfind("\n", 0, MAX_FILE_CHARS + 1)  # end on a whole line
+        if cut > 0:
+            content = content[:cut]
+            end = start + content.count("\n")
+            note = f"continue from line {end + 1}"
+        else:
+            content = content[:MAX_FILE_CHARS]
+            end = start
+            note = f"line {start} alone is longer than that; continue from line {start + 1}"
+        content += f"\n\n... (truncated at 5000 chars — {note})"
+    return {"content": content, "startLine": start, "endLine": end, "totalLines": len(lines)}
+
+
+def _int_arg(value) -> int | None:
+    """A whole-number tool argument, which the model may send as a string. None if absent; ValueError if not a number."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    return int(value)
+
+
+async def readSourceFile(
+    filePath: str,
+    symbol: str | None = None,
+    startLine: int | None = None,
+    endLine: int | None = None,
+) -> dict:
+    normalized = filePath.lstrip("/")
+    try:
+        startLine, endLine = _int_arg(startLine), _int_arg(endLine)
+    except (TypeError, ValueError):
+        return {"error": f"startLine and endLine must be whole numbers, got {startLine!r} and {endLine!r}."}
+
+    if not any(normalized.startswith(prefix) for prefix in ALLOWED_PREFIXES):
+        return {"content": f"Access denied: only files in {', '.join(ALLOWED_PREFIXES)} are readable."}
+
+    content = await run_io("read_source", _load_source, normalized)
+    if content is None:
+        return {"content": f"File not found: {filePath}"}
+    lines = content.splitlines()
+
+    if symbol:
+        symbols = await run_io("outline", _outline, normalized, content)
+        found = find_symbol(symbols, symbol)
+        if found is None:
+            return {
+                "content": f'No symbol "{symbol}" in {filePath}.',
+                "outline": [s.describe() for s in symbols],
+            }
+        return _excerpt(lines, found.start, found.end)
+
+    if startLine or endLine:
+        start = max(startLine or 1, 1)
+        end = min(endLine or len(lines), len(lines))
+        if start > end:
+            return {"content": f"No lines {start}-{end}: {filePath} has {len(lines)} lines."}
+        return _excerpt(lines, start, end)
+
+    if len(content) <= MAX_FILE_CHARS:
+        return {"content": content}
+    return {
+        "content": content[:MAX_FILE_CHARS]
+        + f"\n\n... (truncated at 5000 chars of {len(lines)} lines — use the outline to request a symbol or line range)",
+        "totalLines": len(lines),
+        "outline": [s.describe() for s in await run_io("outline", _outline, normalized, content)],
+    }
+
+
+def _code_roots() -> list[tuple[Path, str]]:
+    """Directories searchCode and the outlines cover, with the path prefix readSourceFile expects for each."""
+    codebase_abs = Path(CODEBASE_DIR).resolve()
+    if codebase_abs.exists():
+        return [(codebase_abs, ""), (Path(BACKEND_CODEBASE_DIR).resolve(), "server/")]
+    return [(Path(PROJECT_ROOT), "")]
+
+
+async def searchCode(query: str, regex: bool = False, maxResults: int | None = None) -> dict:
+    if len(query.strip()) < 2:
+        return {"error": "Query must be at least 2 characters."}
+    try:
+        max_hits = min(_int_arg(maxResults) or CODE_SEARCH_MAX_HITS, CODE_SEARCH_MAX_HITS)
+    except (TypeError, ValueError):
+        return {"error": f"maxResults must be a whole number, got {maxResults!r}."}
+    try:
+        # The first search walks the codebase; keep that off the event loop
+        result = await run_io(
+            "search_code",
+            code_index.search,
+            _code_roots(),
+            query,
+            regex=regex,
+            prefixes=ALLOWED_PREFIXES,
+            max_hits=max(max_hits, 1),
+        )
+    except re.error as e:
+        return {"error": f"Invalid regular expression: {e}"}
+    if not result["matches"]:
+        result["note"] = f'No code matched "{query}". Try a shorter or different query.'
+    return result
+
+
+def _search_rules(query: str) -> dict:
     # Try uploaded codebase first, then fall back to PROJECT_ROOT
     codebase_abs = os.path.abspath(CODEBASE_DIR)
     rules_path = os.path.join(codebase_abs, "docs", "BUSINESS_RULES.md")
     if not os.path.exists(rules_path):
         rules_path = os.path.join(PROJECT_ROOT, "docs", "BUSINESS_RULES.md")
     try:
-        with open(rules_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        import re
-        sections = re.split(r"(?=^## )", content, flags=re.MULTILINE)
-
-        query_lower = query.lower()
-        matches = [s for s in sections if query_lower in s.lower()]
-
+        matches = rules_index.search(rules_path, query, RULES_SEARCH_TOP_K)
         if matches:
             return {"rules": "\n\n---\n\n".join(matches)}
-        return {"rules": content}
+        headings = rules_index.headings(rules_path)
+        return {
+            "rules": f'No business rules matched "{query}". Sections available: '
+            + "; ".join(headings)
+        }
     except FileNotFoundError:
         return {"rules": "Business rules document not found."}
 
 
+async def searchBusinessRules(query: str) -> dict:
+    # The index stats the rules file on every search and re-reads it when it changes
+    return await run_io("search_rules", _search_rules, query)
+
+
 async def classifyIssue(
     *,
     type: str,
@@ -227,7 +389,7 @@ async def classifyIssue(
     element_context: str = "",
     messages: list[ChatMessage] | None = None,
 ) -> dict:
-    report = add_report(
+    report = await add_report(
         type=type,
         title=title,
         summary=summary,
@@ -257,7 +419,18 @@ async def execute_tool(
     if name == "getUserEvents":
         return await getUserEvents(arguments["sessionId"])
     elif name == "readSourceFile":
-        return await readSourceFile(arguments["filePath"])
+        return await readSourceFile(
+            arguments["filePath"],
+            symbol=arguments.get("symbol"),
+            startLine=arguments.get("startLine"),
+            endLine=arguments.get("endLine"),
+        )
+    elif name == "searchCode":
+        return await searchCode(
+            arguments["query"],
+            regex=bool(arguments.get("regex", False)),
+            maxResults=arguments.get("maxResults"),
+        )
     elif name == "searchBusinessRules":
         return await searchBusinessRules(arguments["query"])
     elif name == "classifyIssue":
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from agent.config import TRANSCRIPT_MAX_CONVERSATIONS, TRANSCRIPT_MAX_MESSAGES, TRANSCRIPT_TTL_SECONDS
+from agent.models import ChatMessage, FDERequest
+
+logger = logging.getLogger("relay")
+
+# Request fields that describe the page rather than the turn; omitted ones carry over from the last turn
+CONTEXT_FIELDS = (
+    "sessionId",
+    "elementContext",
+    "errorMessage",
+    "autoTriggered",
+    "frontendLogs",
+    "backendLogs",
+    "codebaseSnapshotPaths",
+    "recentEvents",
+    "pageSnapshot",
+)
+
+
+class TranscriptConflict(Exception):
+    """The client's idea of the transcript doesn't match the server's; resend the full history."""
+
+
+@dataclass
+class _Transcript:
+    messages: list[ChatMessage] = field(default_factory=list)  # the newest TRANSCRIPT_MAX_MESSAGES
+    count: int = 0  # every message ever appended, including trimmed ones
+    context: dict = field(default_factory=dict)
+    touched_at: float = 0.0
+
+
+def _stored(message: ChatMessage) -> ChatMessage:
+    # Only role and text reach the model; parts can carry whole tool outputs
+    return message.model_copy(update={"parts": []}) if message.parts else message
+
+
+class TranscriptStore:
+    """Per-conversation chat history, so clients can send only the new turn.
+
+    A request with ``conversationId`` and ``baseMessageCount`` > 0 is extended
+    with the stored messages and with any context fields it omits. The client's
+    count must match the server's or TranscriptConflict is raised (e.g. after a
+    restart); a request with ``baseMessageCount`` 0 replaces the transcript.
+    expand() only reads; the turn is stored by commit() once the request has
+    been accepted. Least recently used conversations are dropped past
+    ``max_conversations``, and idle ones after ``ttl``.
+    """
+
+    def __init__(self, max_conversations: int, max_messages: int, ttl: float) -> None:
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.conflicts = 0
+        self._transcripts: OrderedDict[str, _Transcript] = OrderedDict()
+
+    def _get(self, conversation_id: str) -> _Transcript | None:
+        transcript = self._transcripts.get(conversation_id)
+        if transcript is not None and time.monotonic() - transcript.touched_at > self.ttl:
+            del self._transcripts[conversation_id]
+            return None
+        return transcript
+
+    def _append(self, transcript: _Transcript, messages: list[ChatMessage]) -> None:
+        transcript.messages.extend(_stored(m) for m in messages)
+        transcript.count += len(messages)
+        if len(transcript.messages) > self.max_messages:
+            del transcript.messages[: len(transcript.messages) - self.max_messages]
+
+    def expand(self, req: FDERequest) -> FDERequest:
+        """The full request for this turn: stored history plus the new messages and context."""
+        if not req.conversationId or req.baseMessageCount == 0:
+            return req
+
+        transcript = self._get(req.conversationId)
+        if transcript is None or transcript.count != req.baseMessageCount:
+            self.conflicts += 1
+            logger.info(
+                "[transcripts] Conversation %s has %s stored message(s), client expected %d",
+                req.conversationId,
+                transcript.count if transcript else "no",
+                req.baseMessageCount,
+            )
+            raise TranscriptConflict(req.conversationId)
+
+        sent = req.model_fields_set
+        context = {name: value for name, value in transcript.context.items() if name not in sent}
+        # model_copy skips validation: stored messages were validated when they arrived
+        return req.model_copy(update={**context, "messages": [*transcript.messages, *req.messages]})
+
+    def commit(self, req: FDERequest, expanded: FDERequest) -> None:
+        """Store the turn ``req`` added, as expanded by expand()."""
+        if not req.conversationId:
+            return
+        transcript = _Transcript(
+            count=req.baseMessageCount,
+            context={name: getattr(expanded, name) for name in CONTEXT_FIELDS},
+        )
+        if req.baseMessageCount:
+            previous = self._transcripts[req.conversationId]
+            transcript.messages = previous.messages
+        self._append(transcript, req.messages)
+        transcript.touched_at = time.monotonic()
+        self._transcripts[req.conversationId] = transcript
+        self._transcripts.move_to_end(req.conversationId)
+        while len(self._transcripts) > self.max_conversations:
+            self._transcripts.popitem(last=False)
+
+    def record_answer(self, conversation_id: str, text: str) -> None:
+        """Append the assistant's reply once its stream ends (partial if the run was cut short)."""
+        transcript = self._get(conversation_id)
+        if transcript is not None:
+            self._append(transcript, [ChatMessage(role="assistant", content=text)])
+
+    def stats(self) -> dict:
+        return {"conversations": len(self._transcripts), "conflicts": self.conflicts}
+
+
+transcript_store = TranscriptStore(TRANSCRIPT_MAX_CONVERSATIONS, TRANSCRIPT_MAX_MESSAGES, TRANSCRIPT_TTL_SECONDS)
@@ -0,0 +1,170 @@
+"""Load test for /api/fde/stream against the offline model stub.
+
+Starts the server with MODEL_PROVIDER=stub in a scratch directory, opens N
+concurrent chat sessions and reports server-side overhead only — no API
+credits are spent. Run from the server directory:
+
+    python -m bench.stream_bench --sessions 50 --tokens-per-second 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0  # not Linux, or the process is gone
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def _request(i: int) -> dict:
+    return {
+        "messages": [{"role": "user", "content": f"Shipping order ORD-{i:03d} failed, what happened?", "id": f"m{i}"}],
+        "sessionId": f"bench-{i}",
+        "errorMessage": "Invalid status transition from pending to shipped",
+        "autoTriggered": False,  # keep the diagnosis cache out of the measurement
+    }
+
+
+async def _session(client: httpx.AsyncClient, i: int) -> dict:
+    result = {"ttfb": None, "frames": 0, "steps": [], "duration": 0.0, "error": None}
+    started = time.perf_counter()
+    step_started = None
+    try:
+        async with client.stream("POST", "/api/fde/stream", json=_request(i)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                now = time.perf_counter()
+                if result["ttfb"] is None:
+                    result["ttfb"] = now - started
+                if not line.startswith("data: "):
+                    continue
+                result["frames"] += 1
+                if line == "data: [DONE]":
+                    break
+                kind = json.loads(line[6:]).get("type")
+                if kind == "start-step":
+                    step_started = now
+                elif kind == "finish-step" and step_started is not None:
+                    result["steps"].append(now - step_started)
+                    step_started = None
+                elif kind == "error":
+                    result["error"] = line[6:]
+    except httpx.HTTPError as e:
+        result["error"] = str(e)
+    result["duration"] = time.perf_counter() - started
+    return result
+
+
+async def _wait_ready(client: httpx.AsyncClient, server: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become healthy within 30s")
+
+
+async def _sample_rss(pid: int, peak: list[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], _rss_kb(pid))
+        await asyncio.sleep(0.05)
+
+
+async def run(sessions: int, tokens_per_second: float) -> dict:
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="relay-bench-")
+    env = {
+        **os.environ,
+        "MODEL_PROVIDER": "stub",
+        "STUB_TOKENS_PER_SECOND": str(tokens_per_second),
+        "POSTHOG_PERSONAL_API_KEY": "",  # getUserEvents answers locally instead of calling out
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(SERVER_DIR),
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            await _wait_ready(client, server)
+            await _session(client, -1)  # warm-up: imports, DB, caches
+            baseline = _rss_kb(server.pid)
+
+            peak = [baseline]
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(_sample_rss(server.pid, peak, stop))
+            started = time.perf_counter()
+            results = await asyncio.gather(*(_session(client, i) for i in range(sessions)))
+            wall = time.perf_counter() - started
+            stop.set()
+            await sampler
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    ttfb = [r["ttfb"] for r in results if r["ttfb"] is not None]
+    steps = [s for r in results for s in r["steps"]]
+    frames = sum(r["frames"] for r in results)
+    return {
+        "sessions": sessions,
+        "errors": sum(1 for r in results if r["error"]),
+        "wallSeconds": round(wall, 3),
+        "ttfbMs": {p: round(_percentile(ttfb, n) * 1000, 1) for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "framesPerSecond": round(frames / wall, 1) if wall else 0.0,
+        "stepLatencyMs": {p: round(_percentile(steps, n) * 1000, 1) for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "stepMeanMs": round(statistics.fmean(steps) * 1000, 1) if steps else 0.0,
+        "rssPerSessionKb": round(max(peak[0] - baseline, 0) / sessions, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent chat sessions")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub streaming rate (0 = unthrottled)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.sessions, args.tokens_per_second)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import queue
+import shutil
+import tarfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+try:
+    import zstandard
+except ImportError:  # declared in pyproject.toml; only needed for .tar.zst uploads
+    zstandard = None
+
+ArchiveFormat = Literal["tar.gz", "tar.zst"]
+
+# Chunks buffered between the request stream and the extractor thread
+_QUEUE_CHUNKS = 16
+
+
+class ChunkReader(io.RawIOBase):
+    """Blocking, read-only file view over byte chunks fed from the event loop.
+
+    The queue is bounded, so a slow disk pushes back on the request body
+    instead of buffering the archive in memory; feed() waits for room on the
+    event loop, without a thread of its own. abandon() wakes a blocked
+    reader, so the extractor thread never outlives a failed upload, and a
+    waiting feed(). Create it on the event loop.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue[bytes | None] = queue.Queue(maxsize=_QUEUE_CHUNKS)
+        self._buffer = memoryview(b"")
+        self._eof = False
+        self._abandoned = False
+        self._loop = asyncio.get_running_loop()
+        self._room = asyncio.Event()  # set when the reader takes a chunk
+
+    def _signal_room(self) -> None:
+        self._loop.call_soon_threadsafe(self._room.set)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._queue.get()
+            self._signal_room()
+            if chunk is None:
+                if self._abandoned:
+                    raise OSError("Upload aborted before the archive ended")
+                self._eof = True
+            else:
+                self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    async def feed(self, chunk: bytes | None) -> bool:
+        """Queue a chunk (None marks the end), waiting while the queue is full.
+
+        Returns False once the reader has been abandoned by the extractor.
+        """
+        while not self._abandoned:
+            self._room.clear()
+            try:
+                self._queue.put_nowait(chunk)
+                return True
+            except queue.Full:
+                await self._room.wait()
+        return False
+
+    def abandon(self) -> None:
+        """Stop both sides: feed() returns False, and a blocked or later read raises."""
+        self._abandoned = True
+        self._signal_room()
+        # Make room for the wake-up sentinel; queued chunks won't be read anyway
+        while True:
+            try:
+                self._queue.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+def extract_archive(
+    reader: ChunkReader,
+    fmt: ArchiveFormat,
+    destination: Callable[[str], Path],
+    on_written: Callable[[str, Path], None],
+) -> None:
+    """Extract regular files from a streamed tarball, one member at a time.
+
+    Runs in a worker thread (see io_pool.run_extraction). ``destination`` maps an archive path to where it
+    should be written (and raises for unsafe paths); ``on_written`` is called
+    after each file lands on disk.
+    """
+    try:
+        raw = io.BufferedReader(reader)
+        if fmt == "tar.zst":
+            if zstandard is None:
+                raise ValueError("tar.zst uploads need the zstandard package installed on the server")
+            with zstandard.ZstdDecompressor().stream_reader(raw) as decompressed:
+                _extract_members(tarfile.open(fileobj=decompressed, mode="r|"), destination, on_written)
+        else:
+            _extract_members(tarfile.open(fileobj=raw, mode="r|gz"), destination, on_written)
+    finally:
+        reader.abandon()
+
+
+def _extract_members(
+    tar: tarfile.TarFile,
+    destination: Callable[[str], Path],
+    on_written: Callable[[str, Path], None],
+) -> None:
+    with tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            path = member.name.removeprefix("./")
+            dest = destination(path)
+            src = tar.extractfile(member)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with src, open(dest, "wb") as out:
+                shutil.copyfileobj(src, out)
+            on_written(path, dest)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+# absolute path -> (mtime_ns, size, sha256), so unchanged files are not re-hashed
+_hashes: dict[str, tuple[int, int, str]] = {}
+_lock = threading.Lock()
+
+
+def _file_hash(path: Path, st: os.stat_result) -> str:
+    key = str(path)
+    with _lock:
+        cached = _hashes.get(key)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    sha = digest.hexdigest()
+    with _lock:
+        _hashes[key] = (st.st_mtime_ns, st.st_size, sha)
+    return sha
+
+
+def build_manifest(backend_dir: Path, frontend_dir: Path, backend_prefix: str) -> dict[str, str]:
+    """Map each stored file, by its original upload path, to its sha256.
+
+    Blocking — call from a worker thread.
+    """
+    manifest: dict[str, str] = {}
+    for base, prefix in ((frontend_dir, ""), (backend_dir, backend_prefix)):
+        if not base.exists():
+            continue
+        for root, _dirs, files in os.walk(base):
+            for name in files:
+                path = Path(root) / name
+                try:
+                    st = path.stat()
+                    sha = _file_hash(path, st)
+                except FileNotFoundError:
+                    continue
+                manifest[prefix + path.relative_to(base).as_posix()] = sha
+    return manifest
+
+
+def forget(path: Path) -> None:
+    with _lock:
+        _hashes.pop(str(path), None)
@@ -14,3 +14,5 @@ class CodeUploadRequest(BaseModel):
     frontend_dir: str = "frontend"
     backend_prefix: str = "server/"  # file paths starting with this go to backend_dir
     files: list[CodeFile] = Field(default_factory=list)
+    # Delta sync: upload paths to remove (same form as CodeFile.path)
+    deleted: list[str] = Field(default_factory=list)
@@ -1,73 +1,236 @@
+import asyncio
+import hashlib
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
+from agent.code_index import code_index
+from agent.io_pool import run_extraction, run_io
+from agent.rules_index import rules_index
+from agent.source_cache import source_cache
+from codebase.archive import ArchiveFormat, ChunkReader, extract_archive
+from codebase.manifest import build_manifest, forget
 from codebase.models import CodeUploadRequest
+from codebase.tree_index import tree_index
 
 router = APIRouter(prefix="/api/codebase")
 
 DATA_DIR = Path("data").resolve()
+# Files per worker-pool job when storing or deleting an upload
+UPLOAD_BATCH_FILES = 32
 
 
 def _safe_resolve(base: Path, relative: str) -> Path:
     """Resolve a relative path under base, rejecting path traversal."""
     dest = (base / relative).resolve()
-    if not str(dest).startswith(str(base.resolve())):
+    if not dest.is_relative_to(base.resolve()):
         raise HTTPException(status_code=400, detail=f"Invalid path: {relative}")
     return dest
 
 
+def _split_destination(path: str, backend_dir: Path, frontend_dir: Path, backend_prefix: str) -> Path:
+    """Paths under backend_prefix go to backend_dir (prefix stripped), the rest to frontend_dir."""
+    if path.startswith(backend_prefix):
+        return _safe_resolve(backend_dir, path[len(backend_prefix):])
+    return _safe_resolve(frontend_dir, path)
+
+
+def _write_file(path: str, dest: Path, content: str) -> None:
+    """Store one uploaded file and update the indexes. Blocking."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_text(content, encoding="utf-8")
+    source_cache.invalidate(path)
+    tree_index.add(dest)
+    code_index.add(dest, content)
+
+
+def _write_files(batch: list[tuple[str, Path, str]]) -> None:
+    for path, dest, content in batch:
+        _write_file(path, dest, content)
+
+
+def _delete_file(path: str, dest: Path) -> bool:
+    """Remove one stored file, if present, and update the indexes. Blocking."""
+    source_cache.invalidate(path)
+    if not dest.is_file():
+        return False
+    dest.unlink()
+    forget(dest)
+    tree_index.remove(dest)
+    code_index.remove(dest)
+    return True
+
+
+def _delete_files(batch: list[tuple[str, Path]]) -> list[bool]:
+    return [_delete_file(path, dest) for path, dest in batch]
+
+
 @router.post("/upload")
 async def upload_codebase(req: CodeUploadRequest):
-    if not req.files:
+    if not req.files and not req.deleted:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    project_dir = DATA_DIR / req.project
-    backend_dir = project_dir / req.backend_dir
-    frontend_dir = project_dir / req.frontend_dir
+    project_dir = _safe_resolve(DATA_DIR, req.project)
+    backend_dir = _safe_resolve(project_dir, req.backend_dir)
+    frontend_dir = _safe_resolve(project_dir, req.frontend_dir)
 
+    # Pool jobs of UPLOAD_BATCH_FILES files: few round trips, yet a large upload
+    # still shares the I/O workers with agent tool reads
     written = []
 
-    for f in req.files:
-        is_backend = f.path.startswith(req.backend_prefix)
+    writes = [
+        (f.path, _split_destination(f.path, backend_dir, frontend_dir, req.backend_prefix), f.content)
+        for f in req.files
+    ]
+    # Batches run in order, so a file uploaded twice ends up with its last content
+    for i in range(0, len(writes), UPLOAD_BATCH_FILES):
+        await run_io("upload_write", _write_files, writes[i:i + UPLOAD_BATCH_FILES])
+    written.extend(str(dest.relative_to(project_dir)) for _path, dest, _content in writes)
 
-        if is_backend:
-            rel_path = f.path[len(req.backend_prefix):]
-            dest = _safe_resolve(backend_dir, rel_path)
-        else:
-            dest = _safe_resolve(frontend_dir, f.path)
+    deleted = []
 
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        dest.write_text(f.content, encoding="utf-8")
-        written.append(str(dest.relative_to(project_dir)))
+    deletes = [(path, _split_destination(path, backend_dir, frontend_dir, req.backend_prefix)) for path in req.deleted]
+    for i in range(0, len(deletes), UPLOAD_BATCH_FILES):
+        batch = deletes[i:i + UPLOAD_BATCH_FILES]
+        removed = await run_io("upload_delete", _delete_files, batch)
+        deleted.extend(str(dest.relative_to(project_dir)) for (_path, dest), gone in zip(batch, removed) if gone)
+
+    rules_index.invalidate()
+    # Build the code search index now rather than on the agent's first search
+    await run_io("code_index_build", code_index.warm, [(frontend_dir, ""), (backend_dir, req.backend_prefix)])
 
     return {
         "status": "ok",
         "project": req.project,
         "files_written": len(written),
+        "files_deleted": len(deleted),
         "output_dir": str(project_dir),
         "paths": written,
+        "deleted_paths": deleted,
     }
 
 
-@router.get("/tree")
-async def codebase_tree(project: str = "relay-engine", backend_dir: str = "backend", frontend_dir: str = "frontend"):
-    """Return the current file tree under data/{project}/."""
-    project_dir = DATA_DIR / project
-
-    if not project_dir.exists():
-        return {"backend": [], "frontend": []}
-
-    def collect(base: Path) -> list[str]:
-        if not base.exists():
-            return []
-        return sorted(
-            str(p.relative_to(base))
-            for p in base.rglob("*")
-            if p.is_file()
-        )
+@router.post("/upload/archive")
+async def upload_codebase_archive(
+    request: Request,
+    project: str = "relay-engine",
+    backend_dir: str = "backend",
+    frontend_dir: str = "frontend",
+    backend_prefix: str = "server/",
+    format: ArchiveFormat = "tar.gz",
+):
+    """Ingest a streamed tar.gz / tar.zst body, extracting files as they arrive.
+
+    Same frontend/backend split as /upload, but the archive is never held in
+    memory and all disk writes happen in a worker thread.
+    """
+    project_dir = _safe_resolve(DATA_DIR, project)
+    backend_path = _safe_resolve(project_dir, backend_dir)
+    frontend_path = _safe_resolve(project_dir, frontend_dir)
+
+    written: list[str] = []
+
+    def on_written(path: str, dest: Path) -> None:
+        source_cache.invalidate(path)
+        tree_index.add(dest)
+        code_index.add(dest)
+        written.append(str(dest.relative_to(project_dir)))
 
+    reader = ChunkReader()
+    extraction = asyncio.create_task(run_extraction(
+        "archive_extract",
+        extract_archive,
+        reader,
+        format,
+        lambda path: _split_destination(path, backend_path, frontend_path, backend_prefix),
+        on_written,
+    ))
+    try:
+        async for chunk in request.stream():
+            if not await reader.feed(chunk):
+                break  # extractor finished or failed — stop reading the body
+        await reader.feed(None)
+        await extraction
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {format} archive: {e}")
+    finally:
+        # If the body stream failed (client disconnect, bad Content-Encoding), this
+        # wakes the extractor, which then fails; wait for its thread either way
+        reader.abandon()
+        await asyncio.wait({extraction})
+        if not extraction.cancelled():
+            extraction.exception()  # already reported above, or moot once the body failed
+        rules_index.invalidate()
+
+    if not written:
+        raise HTTPException(status_code=400, detail="No files provided")
+    await run_io("code_index_build", code_index.warm, [(frontend_path, ""), (backend_path, backend_prefix)])
+
+    return {
+        "status": "ok",
+        "project": project,
+        "files_written": len(written),
+        "output_dir": str(project_dir),
+        "paths": written,
+    }
+
+
+@router.get("/manifest")
+async def codebase_manifest(
+    project: str = "relay-engine",
+    backend_dir: str = "backend",
+    frontend_dir: str = "frontend",
+    backend_prefix: str = "server/",
+):
+    """Return {upload path: sha256} for every file under data/{project}/.
+
+    Clients diff this against their working tree and upload only what changed.
+    """
+    project_dir = _safe_resolve(DATA_DIR, project)
+    files = await run_io(
+        "manifest",
+        build_manifest,
+        _safe_resolve(project_dir, backend_dir),
+        _safe_resolve(project_dir, frontend_dir),
+        backend_prefix,
+    )
+    return {"project": project, "algorithm": "sha256", "files": files}
+
+
+@router.get("/tree")
+async def codebase_tree(
+    request: Request,
+    response: Response,
+    project: str = "relay-engine",
+    backend_dir: str = "backend",
+    frontend_dir: str = "frontend",
+    prefix: str = "",
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+):
+    """Return the current file tree under data/{project}/, optionally filtered and paged."""
+    project_dir = _safe_resolve(DATA_DIR, project)
+    backend_path = _safe_resolve(project_dir, backend_dir)
+    frontend_path = _safe_resolve(project_dir, frontend_dir)
+
+    # First request per directory walks the disk; keep that off the event loop
+    versions = await asyncio.gather(
+        run_io("tree_walk", tree_index.version, backend_path),
+        run_io("tree_walk", tree_index.version, frontend_path),
+    )
+    digest = hashlib.sha1(repr((versions, prefix, offset, limit)).encode())
+    etag = f'W/"{digest.hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    backend, backend_total = tree_index.list(backend_path, prefix, offset, limit)
+    frontend, frontend_total = tree_index.list(frontend_path, prefix, offset, limit)
+    response.headers.update(headers)
     return {
-        "backend": collect(project_dir / backend_dir),
-        "frontend": collect(project_dir / frontend_dir),
+        "backend": backend,
+        "frontend": frontend,
+        "total": {"backend": backend_total, "frontend": frontend_total},
     }
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Directories kept indexed; the least recently read is dropped (and re-walked if read again)
+MAX_TREES = 64
+
+
+@dataclass
+class _Tree:
+    paths: list[str] = field(default_factory=list)  # sorted, relative to the base dir
+    generation: int = 0  # bumped whenever a path is added or removed
+    # Distinguishes walks, so a restarted process never reuses an old version
+    build_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+
+
+# Stands in for a directory that doesn't exist (yet), with a stable version
+_MISSING = _Tree(build_id="missing")
+
+
+class TreeIndex:
+    """In-memory sorted file list per uploaded directory (e.g. data/{project}/frontend).
+
+    A directory is walked once, on first read; after that the upload endpoints
+    keep it current through add() / remove(), so /tree never touches the disk.
+    At most MAX_TREES directories are kept, and one that doesn't exist is
+    never indexed. The walk runs outside the lock; files added or removed
+    meanwhile are rechecked once the result is installed.
+    """
+
+    def __init__(self) -> None:
+        self._trees: OrderedDict[Path, _Tree] = OrderedDict()
+        self._building: dict[Path, set[Path]] = {}  # directory being walked -> dests touched meanwhile
+        self._lock = threading.Lock()
+
+    def _tree(self, base: Path) -> _Tree:
+        """Indexed tree for base, walking the directory on first use. Blocking."""
+        with self._lock:
+            tree = self._trees.get(base)
+            if tree is not None:
+                self._trees.move_to_end(base)
+                return tree
+            if not base.is_dir():
+                return _MISSING
+            self._building.setdefault(base, set())
+        try:
+            paths = []
+            for root, _dirs, files in os.walk(base):
+                rel_root = Path(root).relative_to(base)
+                paths.extend((rel_root / name).as_posix() for name in files)
+            paths.sort()
+        except BaseException:
+            with self._lock:
+                self._building.pop(base, None)
+            raise
+        with self._lock:
+            touched = self._building.pop(base, set())
+            tree = self._trees.get(base)
+            if tree is None:  # not installed by a concurrent walk
+                tree = self._trees[base] = _Tree(paths)
+                for dest in touched:
+                    self._apply(tree, dest.relative_to(base).as_posix(), dest.is_file())
+            self._trees.move_to_end(base)
+            while len(self._trees) > MAX_TREES:
+                self._trees.popitem(last=False)
+            return tree
+
+    def _locate(self, dest: Path) -> tuple[_Tree, str] | None:
+        for base, tree in self._trees.items():
+            if dest.is_relative_to(base):
+                return tree, dest.relative_to(base).as_posix()
+        for base, touched in self._building.items():
+            if dest.is_relative_to(base):
+                touched.add(dest)
+        return None
+
+    @staticmethod
+    def _apply(tree: _Tree, rel: str, present: bool) -> None:
+        i = bisect.bisect_left(tree.paths, rel)
+        found = i < len(tree.paths) and tree.paths[i] == rel
+        if present and not found:
+            tree.paths.insert(i, rel)
+            tree.generation += 1
+        elif found and not present:
+            del tree.paths[i]
+            tree.generation += 1
+
+    def add(self, dest: Path) -> None:
+        with self._lock:
+            found = self._locate(dest)
+            if found is None:
+                return  # directory not indexed yet — the first read will walk it
+            self._apply(*found, present=True)
+
+    def remove(self, dest: Path) -> None:
+        with self._lock:
+            found = self._locate(dest)
+            if found is not None:
+                self._apply(*found, present=False)
+
+    def version(self, base: Path) -> str:
+        """Opaque token that changes only when the set of paths under base changes."""
+        tree = self._tree(base)
+        with self._lock:
+            return f"{tree.build_id}:{tree.generation}"
+
+    def list(self, base: Path, prefix: str = "", offset: int = 0, limit: int | None = None) -> tuple[list[str], int]:
+        """Page of paths under base starting with prefix, plus the total match count."""
+        tree = self._tree(base)
+        with self._lock:
+            start = bisect.bisect_left(tree.paths, prefix)
+            # Every string starting with prefix sorts before prefix + U+10FFFF
+            end = bisect.bisect_left(tree.paths, prefix + "\U0010ffff", lo=start) if prefix else len(tree.paths)
+            stop = end if limit is None else min(end, start + offset + limit)
+            return tree.paths[start + offset:stop], end - start
+
+
+tree_index = TreeIndex()
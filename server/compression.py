@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # declared in pyproject.toml; without it only gzip is offered and accepted
+    zstandard = None
+
+# zstd has no output cap per call, so compressed input is fed in slices this small
+_ZSTD_INPUT_SLICE = 256
+
+
+class _GzipDecoder:
+    def __init__(self) -> None:
+        self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        """At most ``limit`` + 1 bytes, so the caller can tell the cap was crossed."""
+        return self._inflate.decompress(data, limit + 1)
+
+    @property
+    def finished(self) -> bool:
+        return self._inflate.eof
+
+
+class _ZstdDecoder:
+    def __init__(self) -> None:
+        self._inflate = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        parts: list[bytes] = []
+        size = 0
+        for start in range(0, len(data), _ZSTD_INPUT_SLICE):
+            part = self._inflate.decompress(data[start:start + _ZSTD_INPUT_SLICE])
+            parts.append(part)
+            size += len(part)
+            if size > limit:
+                break
+        return b"".join(parts)
+
+    @property
+    def finished(self) -> bool:
+        return getattr(self._inflate, "eof", True)
+
+
+_DECODERS = {"gzip": _GzipDecoder, "x-gzip": _GzipDecoder}
+_DECODE_ERRORS: tuple[type[Exception], ...] = (zlib.error,)
+if zstandard is not None:
+    _DECODERS["zstd"] = _ZstdDecoder
+    _DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int) -> None:
+        self._deflate = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, *, final: bool) -> bytes:
+        return self._deflate.compress(data) + self._deflate.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int = 3) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def encode(self, data: bytes, *, final: bool) -> bytes:
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+class _CompressingSend:
+    """Wraps ``send`` to compress one response body, or pass it through untouched.
+
+    The start message is held until the first body chunk shows whether the
+    response is worth compressing: a complete body under ``minimum_size`` is
+    sent as is. Streamed chunks are flushed one by one, so a slow stream
+    still reaches the client as it is produced. Responses that already have a
+    Content-Encoding, and server-sent events, are never touched.
+    """
+
+    def __init__(self, send: Send, encoder_factory, minimum_size: int) -> None:
+        self._send = send
+        self._encoder_factory = encoder_factory
+        self._minimum_size = minimum_size
+        self._start: Message | None = None
+        self._encoder = None
+        self._passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or headers.get("content-type", "").startswith("text/event-stream"):
+                self._passthrough = True
+                await self._send(message)
+            else:
+                self._start = message
+            return
+
+        if self._passthrough or message["type"] != "http.response.body":
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._encoder is None:
+            if not more_body and len(body) < self._minimum_size:
+                self._passthrough = True
+                await self._flush_start()
+                await self._send(message)
+                return
+            self._encoder = self._encoder_factory()
+            headers = MutableHeaders(raw=self._start["headers"])
+            del headers["content-length"]
+            headers["content-encoding"] = self._encoder.name
+            headers.add_vary_header("Accept-Encoding")
+            body = self._encoder.encode(body, final=not more_body)
+            if not more_body:
+                headers["content-length"] = str(len(body))
+            await self._flush_start()
+        else:
+            body = self._encoder.encode(body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def _flush_start(self) -> None:
+        if self._start is not None:
+            start, self._start = self._start, None
+            await self._send(start)
+
+
+def _accepted(header: str) -> set[str]:
+    """Codings an Accept-Encoding header allows (q=0 means refused)."""
+    accepted = set()
+    for item in header.lower().split(","):
+        name, _, params = item.partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(name.strip())
+    return accepted
+
+
+class CompressionMiddleware:
+    """gzip/zstd request bodies in, compressed responses out.
+
+    Request bodies with a Content-Encoding are inflated as they are received,
+    with a cap of ``max_request_bytes`` on the decompressed size (413 past it).
+    Responses of at least ``minimum_size`` bytes are compressed with zstd or
+    gzip, whichever the client accepts (zstd preferred). Server-sent events are
+    never compressed, so each frame still reaches the client as it is sent.
+    """
+
+    def __init__(self, app: ASGIApp, *, minimum_size: int, max_request_bytes: int, gzip_level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_bytes = max_request_bytes
+        self.gzip_level = gzip_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = headers.get("content-encoding", "").strip().lower()
+        if encoding and encoding != "identity":
+            decoder_type = _DECODERS.get(encoding)
+            if decoder_type is None:
+                response = JSONResponse(
+                    {"detail": f"Unsupported Content-Encoding: {encoding}"},
+                    status_code=415,
+                    headers={"Accept-Encoding": ", ".join(_DECODERS)},
+                )
+                await response(scope, receive, send)
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+            receive = self._inflating(receive, decoder_type())
+
+        accepted = _accepted(headers.get("accept-encoding", ""))
+        if zstandard is not None and "zstd" in accepted:
+            send = _CompressingSend(send, _ZstdEncoder, self.minimum_size)
+        elif "gzip" in accepted:
+            send = _CompressingSend(send, lambda: _GzipEncoder(self.gzip_level), self.minimum_size)
+        await self.app(scope, receive, send)
+
+    def _inflating(self, receive: Receive, decoder) -> Receive:
+        received = 0
+
+        async def inflating_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            try:
+                body = decoder.decompress(message.get("body", b""), self.max_request_bytes - received)
+            except _DECODE_ERRORS as e:
+                raise HTTPException(status_code=400, detail=f"Malformed request body encoding: {e}")
+            received += len(body)
+            if received > self.max_request_bytes:
+                raise HTTPException(status_code=413, detail="Request body too large once decompressed")
+            if not message.get("more_body", False) and not decoder.finished:
+                raise HTTPException(status_code=400, detail="Truncated compressed request body")
+            return {**message, "body": body}
+
+        return inflating_receive
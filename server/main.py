@@ -3,11 +3,21 @@ import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 
+from compression import CompressionMiddleware
 from database import engine, init_db
+from agent import metrics, posthog
+from agent.admission import admission
+from agent.config import COMPRESSION_MIN_BYTES, REQUEST_MAX_DECOMPRESSED_BYTES
 from agent import router as fde_router
+from agent.diagnosis import diagnosis_cache
+from agent.event_cache import event_cache
+from agent.runs import run_registry
+from agent.transcripts import transcript_store
+from agent.source_cache import source_cache
 from codebase import router as codebase_router
 
 from dotenv import load_dotenv
@@ -25,11 +35,19 @@ logging.basicConfig(
 async def lifespan(app: FastAPI):
     os.makedirs("data", exist_ok=True)
     init_db()
+    posthog.open_client()
     yield
+    await posthog.close_client()
 
 
 app = FastAPI(title="Relay Engine API", lifespan=lifespan)
 
+# Added before CORS so CORS wraps it and its 413/415 responses still carry CORS headers
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_BYTES,
+    max_request_bytes=REQUEST_MAX_DECOMPRESSED_BYTES,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -42,6 +60,11 @@ app.include_router(fde_router)
 app.include_router(codebase_router)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 def health():
     try:
@@ -54,4 +77,10 @@ def health():
     return {
         "status": "healthy" if db_ok else "degraded",
         "database": "connected" if db_ok else "disconnected",
+        "sourceCache": source_cache.stats(),
+        "eventCache": event_cache.stats(),
+        "diagnosisCache": diagnosis_cache.stats(),
+        "admission": admission.stats(),
+        "replay": run_registry.stats(),
+        "transcripts": transcript_store.stats(),
     }